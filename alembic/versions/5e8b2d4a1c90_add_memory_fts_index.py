@@ -0,0 +1,61 @@
+"""add FTS5 full-text index over memory content
+
+Revision ID: 5e8b2d4a1c90
+Revises: c3f1a9d2e7b4
+Create Date: 2026-10-16 11:02:17.540912
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e8b2d4a1c90"
+down_revision: Union[str, Sequence[str], None] = "c3f1a9d2e7b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# External-content FTS5 table over memory.content. The triggers keep it in
+# sync with every insert, delete and content update on `memory`.
+UPGRADE_STATEMENTS = [
+    (
+        "CREATE VIRTUAL TABLE memory_fts USING fts5("
+        "content, content='memory', content_rowid='id')"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_ai AFTER INSERT ON memory BEGIN "
+        "INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_ad AFTER DELETE ON memory BEGIN "
+        "INSERT INTO memory_fts(memory_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "END"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_au AFTER UPDATE OF content ON memory BEGIN "
+        "INSERT INTO memory_fts(memory_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    ),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in UPGRADE_STATEMENTS:
+        op.execute(statement)
+    # index the memories that already exist
+    op.execute("INSERT INTO memory_fts(memory_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS memory_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS memory_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS memory_fts_ai")
+    op.execute("DROP TABLE IF EXISTS memory_fts")
@@ -0,0 +1,42 @@
+"""add reminder table
+
+Revision ID: 9a4c7e1f3b25
+Revises: 5e8b2d4a1c90
+Create Date: 2026-10-16 13:40:06.112873
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9a4c7e1f3b25"
+down_revision: Union[str, Sequence[str], None] = "5e8b2d4a1c90"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "reminder",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=True),
+        sa.Column("recurrence", sa.String(), nullable=True),
+        sa.Column("last_sent_at", sa.DateTime(), nullable=True),
+        sa.Column("created_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_reminder_id"), "reminder", ["id"], unique=False)
+    op.create_index(op.f("ix_reminder_due_at"), "reminder", ["due_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_reminder_due_at"), table_name="reminder")
+    op.drop_index(op.f("ix_reminder_id"), table_name="reminder")
+    op.drop_table("reminder")
@@ -0,0 +1,36 @@
+"""add memory access stats
+
+Revision ID: a6e1d4c9b7f2
+Revises: f2c9e7a4b1d8
+Create Date: 2026-10-17 15:08:37.662140
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a6e1d4c9b7f2"
+down_revision: Union[str, Sequence[str], None] = "f2c9e7a4b1d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Plain ADD COLUMNs: a batch migration would recreate the memory table
+    # and drop the triggers keeping memory_fts in sync.
+    op.add_column(
+        "memory",
+        sa.Column("access_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("memory", sa.Column("last_accessed", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("memory", "last_accessed")
+    op.drop_column("memory", "access_count")
@@ -0,0 +1,35 @@
+"""index message_archive created_time
+
+Revision ID: b8d3f5a1c6e9
+Revises: e4b1c8f2a7d6
+Create Date: 2026-10-17 13:42:10.518306
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d3f5a1c6e9"
+down_revision: Union[str, Sequence[str], None] = "e4b1c8f2a7d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite appends the rowid (our id) to every index entry, so this index
+    # also serves the (created_time, id) keyset pagination of old messages.
+    op.create_index(
+        op.f("ix_message_archive_created_time"),
+        "message_archive",
+        ["created_time"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_message_archive_created_time"), table_name="message_archive")
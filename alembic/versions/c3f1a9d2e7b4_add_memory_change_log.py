@@ -0,0 +1,51 @@
+"""add memory change log and maintenance checkpoints
+
+Revision ID: c3f1a9d2e7b4
+Revises: 4b805b010fb4
+Create Date: 2026-10-16 09:12:41.318254
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f1a9d2e7b4"
+down_revision: Union[str, Sequence[str], None] = "4b805b010fb4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "memory_change",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("memory_id", sa.Integer(), nullable=False),
+        sa.Column("operation", sa.String(), nullable=False),
+        sa.Column("created_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_memory_change_id"), "memory_change", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_memory_change_memory_id"), "memory_change", ["memory_id"], unique=False
+    )
+    op.create_table(
+        "maintenance_checkpoint",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_change_id", sa.Integer(), nullable=False),
+        sa.Column("last_full_time", sa.DateTime(), nullable=True),
+        sa.Column("updated_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("maintenance_checkpoint")
+    op.drop_index(op.f("ix_memory_change_memory_id"), table_name="memory_change")
+    op.drop_index(op.f("ix_memory_change_id"), table_name="memory_change")
+    op.drop_table("memory_change")
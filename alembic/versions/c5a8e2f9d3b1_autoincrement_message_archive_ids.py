@@ -0,0 +1,47 @@
+"""autoincrement message archive ids
+
+Revision ID: c5a8e2f9d3b1
+Revises: a6e1d4c9b7f2
+Create Date: 2026-10-17 16:21:44.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5a8e2f9d3b1"
+down_revision: Union[str, Sequence[str], None] = "a6e1d4c9b7f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Without AUTOINCREMENT SQLite hands out max(id) + 1, so ids of archives
+    # moved to message_archive_cold could be given out again.
+    with op.batch_alter_table(
+        "message_archive",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": True},
+    ):
+        pass
+    # continue after the highest id used in either table
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'message_archive'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'message_archive', max("
+        "(SELECT coalesce(max(id), 0) FROM message_archive), "
+        "(SELECT coalesce(max(id), 0) FROM message_archive_cold))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table(
+        "message_archive",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": False},
+    ):
+        pass
@@ -0,0 +1,36 @@
+"""add history summary table
+
+Revision ID: d7e2a6b9c413
+Revises: 9a4c7e1f3b25
+Create Date: 2026-10-17 09:12:44.530912
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7e2a6b9c413"
+down_revision: Union[str, Sequence[str], None] = "9a4c7e1f3b25"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "history_summary",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("last_archive_id", sa.Integer(), nullable=False),
+        sa.Column("updated_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("history_summary")
@@ -0,0 +1,51 @@
+"""add cold message archive and incremental auto-vacuum
+
+Revision ID: e4b1c8f2a7d6
+Revises: d7e2a6b9c413
+Create Date: 2026-10-17 11:03:27.804153
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b1c8f2a7d6"
+down_revision: Union[str, Sequence[str], None] = "d7e2a6b9c413"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "message_archive_cold",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.LargeBinary(), nullable=False),
+        sa.Column("created_time", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_message_archive_cold_created_time"),
+        "message_archive_cold",
+        ["created_time"],
+        unique=False,
+    )
+    # Let PRAGMA incremental_vacuum hand freed pages back to the filesystem.
+    # Changing auto_vacuum on an existing database only takes effect after a
+    # VACUUM, which cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        op.execute("VACUUM")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_message_archive_cold_created_time"),
+        table_name="message_archive_cold",
+    )
+    op.drop_table("message_archive_cold")
@@ -0,0 +1,31 @@
+"""index memory created_time
+
+Revision ID: f2c9e7a4b1d8
+Revises: b8d3f5a1c6e9
+Create Date: 2026-10-17 14:26:51.093417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c9e7a4b1d8"
+down_revision: Union[str, Sequence[str], None] = "b8d3f5a1c6e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the (created_time, id) keyset pagination of /api/memories.
+    op.create_index(
+        op.f("ix_memory_created_time"), "memory", ["created_time"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_memory_created_time"), table_name="memory")
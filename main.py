@@ -1,21 +1,39 @@
-import threading
+import contextlib
 import os
 import dotenv
 import asyncio
 import logging
+import signal
 import time
 import math
+from datetime import timedelta
+from typing import Iterator
 
 import logfire
-from zeno.telegram_bot import run_bot
+import uvicorn
+from zeno.telegram_bot import serve_bot
 from zeno.api import app as api_app
-from zeno.agents import (
-    build_deduplicator_agent,
-    build_aggregator_agent,
-    build_splitter_agent,
-    build_garbage_collector_agent,
-    build_reminder_agent,
+from zeno.agents import build_agents
+from zeno.db import dispose_engines
+from zeno.config import (
+    ARCHIVE_COMPRESS_DAYS,
+    ARCHIVE_RETENTION_DAYS,
+    MAINTENANCE_MODE,
 )
+from zeno.llm import close_models
+from zeno.maintenance import MAINTENANCE_TASKS, run_maintenance_task
+from zeno.relevance import rescore_memories
+from zeno.reminders import process_due_reminders, scan_reminder_memories
+from zeno.runtime import supervise
+from zeno.scheduler import reminder_scheduler
+from zeno.storage import (
+    compact_message_archive,
+    incremental_vacuum,
+    init_db,
+    load_message_history,
+)
+from zeno.utils import get_current_naive_time
+from zeno.telegram_client import close_bot
 
 
 def setup_logfire() -> None:
@@ -31,24 +49,11 @@ def setup_logfire() -> None:
         logfire.instrument_pydantic_ai()
 
 
-def _run_uvicorn() -> None:
-    """Run the FastAPI app with uvicorn (used in a background thread)."""
-    import uvicorn
-
-    uvicorn.run(api_app, host="0.0.0.0", port=8001)
-
-
-def start_api_thread() -> threading.Thread:
-    """Start the web API in a daemon thread and return the Thread object."""
-    t = threading.Thread(target=_run_uvicorn, daemon=True)
-    t.start()
-    return t
-
-
 async def _periodic_maintenance_loop(
     interval_hours: int, offset_seconds: int = 300
 ) -> None:
-    """Async loop for periodic maintenance tasks (dedup/aggregate/split/gc).
+    """Async loop for periodic maintenance tasks (relevance scoring and
+    dedup/aggregate/split/gc).
 
     Runs are aligned to wall-clock multiples of the interval, with an additional
     offset (in seconds) applied so maintenance runs do not collide with other
@@ -73,33 +78,10 @@ async def _periodic_maintenance_loop(
         try:
             logfire.info("Running gardening stuff")
 
-            dedup_agent = await build_deduplicator_agent()
-            resp = await dedup_agent.run("Deduplicate memories")
-            logger.info(
-                "Deduplicator run complete: %s",
-                getattr(resp, "output", "(no output)"),
-            )
-
-            aggregator = await build_aggregator_agent()
-            resp = await aggregator.run("Aggregate memories")
-            logger.info(
-                "Aggregator run complete: %s",
-                getattr(resp, "output", "(no output)"),
-            )
-
-            splitter = await build_splitter_agent()
-            resp = await splitter.run("Split overaggregated memories")
-            logger.info(
-                "Splitter run complete: %s",
-                getattr(resp, "output", "(no output)"),
-            )
-
-            gc = await build_garbage_collector_agent()
-            resp = await gc.run("Garbage collect old/unneeded memories")
-            logger.info(
-                "Garbage collector run complete: %s",
-                getattr(resp, "output", "(no output)"),
-            )
+            await rescore_memories()
+            for name in MAINTENANCE_TASKS:
+                output = await run_maintenance_task(name, mode=MAINTENANCE_MODE)
+                logger.info("%s run complete: %s", name, output or "(no output)")
 
         except Exception:
             logger.exception("Periodic maintenance failed")
@@ -113,29 +95,13 @@ async def _periodic_maintenance_loop(
         await asyncio.sleep(next_run - now)
 
 
-def start_periodic_thread(
-    interval_hours: int = 10, offset_seconds: int = 300
-) -> threading.Thread:
-    """Start the periodic maintenance loop in a daemon thread.
+async def _memory_scan_loop(interval_minutes: int) -> None:
+    """Async loop running the reminder agent over all memories, aligned to
+    wall-clock intervals.
 
-    offset_seconds will be passed to the loop to offset the maintenance runs so
-    they don't collide with the reminder runs.
+    Ticks are skipped without an LLM call unless a reminder memory was stored
+    or updated since the last scan (see scan_reminder_memories).
     """
-
-    def target() -> None:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(
-            _periodic_maintenance_loop(interval_hours, offset_seconds)
-        )
-
-    t = threading.Thread(target=target, daemon=True)
-    t.start()
-    return t
-
-
-async def _reminder_loop(interval_minutes: int) -> None:
-    """Async loop for reminder agent runs, aligned to wall-clock intervals."""
     logger = logging.getLogger("zeno.reminder")
     interval_secs = interval_minutes * 60
 
@@ -147,13 +113,10 @@ async def _reminder_loop(interval_minutes: int) -> None:
 
     while True:
         try:
-            reminder = await build_reminder_agent()
-            logfire.info("Running reminder agent")
-            resp = await reminder.run("Check for due reminders", message_history=None)
-            logger.info(
-                "Reminder agent run complete: %s",
-                getattr(resp, "output", "(no output)"),
-            )
+            output = await scan_reminder_memories()
+            if output is not None:
+                logfire.info("Ran reminder agent")
+                logger.info("Reminder agent run complete: %s", output)
         except Exception:
             logger.exception("Reminder agent failed")
             logfire.info("Reminder agent failed")
@@ -165,31 +128,101 @@ async def _reminder_loop(interval_minutes: int) -> None:
         await asyncio.sleep(next_run - now)
 
 
-def start_reminder_thread(interval_minutes: int = 15) -> threading.Thread:
-    """Start the reminder loop in a daemon thread."""
+async def _reminder_loop(interval_minutes: int) -> None:
+    """Deliver scheduled reminders as soon as they are due.
 
-    def target() -> None:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(_reminder_loop(interval_minutes))
+    The scheduler sleeps until the next due time and is woken early by tool
+    writes. Reminders that only exist as memories are picked up by the memory
+    scan, which checks for changed reminder memories every `interval_minutes`.
+    """
+    await asyncio.gather(
+        reminder_scheduler.run(process_due_reminders),
+        _memory_scan_loop(interval_minutes),
+    )
 
-    t = threading.Thread(target=target, daemon=True)
-    t.start()
-    return t
 
+async def _archive_loop(interval_hours: int) -> None:
+    """Compress old message archives, apply the retention policy and
+    vacuum freed pages, once per interval."""
+    logger = logging.getLogger("zeno.archive")
+    while True:
+        try:
+            now = get_current_naive_time()
+            compressed, deleted = await compact_message_archive(
+                now - timedelta(days=ARCHIVE_COMPRESS_DAYS),
+                now - timedelta(days=ARCHIVE_RETENTION_DAYS)
+                if ARCHIVE_RETENTION_DAYS
+                else None,
+            )
+            await incremental_vacuum()
+            logger.info(
+                "Archive compaction: %d compressed, %d deleted", compressed, deleted
+            )
+        except Exception:
+            logger.exception("Archive compaction failed")
+        await asyncio.sleep(interval_hours * 3600)
 
-def main() -> None:
-    """Small entrypoint: configure logging, start background threads and run bot."""
-    setup_logfire()
 
-    start_api_thread()
-    # Start maintenance with a small offset so it doesn't collide with reminders.
-    # Default reminder interval is 15 minutes (900s) and maintenance offset is 5 minutes (300s),
-    # which results in maintenance runs offset from reminder ticks. Adjust offsets via args/env later.
-    start_periodic_thread(offset_seconds=300)
-    start_reminder_thread()
+class _ApiServer(uvicorn.Server):
+    """uvicorn server that leaves signal handling to run()."""
+
+    @contextlib.contextmanager
+    def capture_signals(self) -> Iterator[None]:
+        yield
+
+
+async def run() -> None:
+    """Run the bot, the web API and both periodic loops on one event loop.
+
+    All of them are tasks of a single TaskGroup sharing the database engine.
+    SIGINT/SIGTERM stop the API gracefully and cancel the other tasks; if any
+    task fails, the group cancels the rest and the error propagates.
+    """
+    logger = logging.getLogger(__name__)
+    await init_db()
+    await load_message_history()
+    build_agents()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    server = _ApiServer(uvicorn.Config(api_app, host="0.0.0.0", port=8001))
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(supervise("api", server.serve()))
+            # Start maintenance with a small offset so it doesn't collide with reminders.
+            cancellable = [
+                tg.create_task(supervise("bot", serve_bot())),
+                tg.create_task(
+                    supervise("maintenance", _periodic_maintenance_loop(10, 300))
+                ),
+                tg.create_task(supervise("reminders", _reminder_loop(15))),
+                tg.create_task(supervise("archive", _archive_loop(24))),
+            ]
+
+            await stop.wait()
+            logger.info("Shutting down")
+            server.should_exit = True
+            for task in cancellable:
+                task.cancel()
+    finally:
+        await close_bot()
+        await close_models()
+        # Pooled aiosqlite connections run on worker threads that would keep
+        # the process alive after the loop ends.
+        await dispose_engines()
+
 
-    run_bot()
+def main() -> None:
+    """Small entrypoint: configure logging and run all tasks until stopped."""
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    setup_logfire()
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+
+# zeno.config requires a chat id and zeno.db binds its engine at import time,
+# so both have to be set before any zeno module is imported.
+os.environ.setdefault("TELEGRAM_CHAT_ID", "1")
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='zeno-test-')}/zeno.db",
+)
+
+import pytest  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+# The FTS5 index of the memory migration; SQLAlchemy metadata can't express
+# it, so the test schema creates it from its own copy of the statements.
+MEMORY_FTS_DDL = [
+    (
+        "CREATE VIRTUAL TABLE memory_fts USING fts5("
+        "content, content='memory', content_rowid='id')"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_ai AFTER INSERT ON memory BEGIN "
+        "INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_ad AFTER DELETE ON memory BEGIN "
+        "INSERT INTO memory_fts(memory_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "END"
+    ),
+    (
+        "CREATE TRIGGER memory_fts_au AFTER UPDATE OF content ON memory BEGIN "
+        "INSERT INTO memory_fts(memory_fts, rowid, content) "
+        "VALUES ('delete', old.id, old.content); "
+        "INSERT INTO memory_fts(rowid, content) VALUES (new.id, new.content); "
+        "END"
+    ),
+]
+
+
+@pytest.fixture
+def db():
+    """Provide an empty database created from the ORM metadata."""
+    from zeno import storage
+    from zeno.db import async_engine, dispose_engines
+    from zeno.models import Base
+
+    async def reset() -> None:
+        async with async_engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS memory_fts"))
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            for statement in MEMORY_FTS_DDL:
+                await conn.execute(text(statement))
+        # aiosqlite connections are bound to the loop that opened them and
+        # every test drives its own loop through asyncio.run().
+        await dispose_engines()
+
+    asyncio.run(reset())
+    # drop in-process state derived from the previous database
+    storage.bump_memory_version()
+    storage._message_history = None
+    storage._history_summary_loaded = False
+    yield
+    asyncio.run(dispose_engines())
+
+
+@pytest.fixture
+def test_model(mocker):
+    """Build the agents around a TestModel that doesn't call any tools."""
+    from pydantic_ai.models.test import TestModel
+
+    from zeno import agents
+
+    model = TestModel(call_tools=[])
+    mocker.patch.object(agents, "get_openai_model", return_value=model)
+    agents.reset_agents()
+    yield model
+    agents.reset_agents()
+
+
+@pytest.fixture
+def tool_ctx():
+    """Build the run context an agent passes to its tools, to call them directly."""
+    from pydantic_ai import RunContext
+    from pydantic_ai.models.test import TestModel
+    from pydantic_ai.usage import RunUsage
+
+    from zeno.tools import ToolDeps
+
+    def make(deps: ToolDeps | None = None) -> RunContext[ToolDeps]:
+        return RunContext(deps=deps or ToolDeps(), model=TestModel(), usage=RunUsage())
+
+    return make
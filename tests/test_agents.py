@@ -0,0 +1,74 @@
+import asyncio
+
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.messages import ModelRequest
+
+from zeno import agents, storage
+from zeno.tools import ToolDeps, store_memory
+
+
+def _instructions(res: AgentRunResult) -> str:
+    request = res.all_messages()[0]
+    assert isinstance(request, ModelRequest) and request.instructions
+    return request.instructions
+
+
+def test_agents_are_reused_with_per_run_memories(db, test_model, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "the cat is called Mia")
+        await store_memory(tool_ctx(), "lunch with Anna on friday")
+
+        chat = agents.get_agent("chat")
+        assert agents.get_agent("chat") is chat
+
+        res = await chat.run("hi", deps=ToolDeps(query="what is my cat called?"))
+        instructions = _instructions(res)
+        assert "called Mia" in instructions
+        assert "Anna" not in instructions
+
+        # a later run renders memories stored in between
+        await store_memory(tool_ctx(), "the cat Mia likes tuna")
+        res = await chat.run("hi", deps=ToolDeps(query="what does my cat like?"))
+        assert "likes tuna" in _instructions(res)
+
+    asyncio.run(scenario())
+
+
+def test_memory_prompt_is_packed_into_the_agent_budget(
+    db, test_model, mocker, tool_ctx
+):
+    mocker.patch.dict(agents.MEMORY_TOKEN_BUDGETS, {"reminder": 60})
+
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Remind me to water the plants on sunday")
+        await store_memory(tool_ctx(), "a rather long and old memory " * 10)
+        await store_memory(tool_ctx(), "likes green tea")
+        await storage.set_memory_relevance({2: 0.1, 3: 0.9})
+
+        res = await agents.run_agent("reminder", "Check for due reminders")
+        instructions = _instructions(res)
+        # the pinned reminder and the relevant short memory fit, the long
+        # one doesn't and is reported
+        assert "water the plants" in instructions
+        assert "green tea" in instructions
+        assert "rather long" not in instructions
+        assert "1 older or less relevant memories were left out" in instructions
+
+    asyncio.run(scenario())
+
+
+def test_pinned_memories_leave_room_for_relevant_ones(db, mocker, tool_ctx):
+    mocker.patch.dict(agents.MEMORY_TOKEN_BUDGETS, {"chat": 100})
+    mocker.patch.object(agents, "CHAT_PINNED_TOKEN_BUDGET", 45)
+
+    async def scenario() -> None:
+        for day in ("monday", "tuesday", "wednesday", "thursday"):
+            await store_memory(tool_ctx(), f"Remind me to water the plants on {day}")
+        await store_memory(tool_ctx(), "the cat is called Mia")
+
+        text = await agents.get_relevant_memories_text("what is my cat called?")
+        # only the pinned budget is spent on reminders, the rest on the match
+        assert "called Mia" in text
+        assert text.count("water the plants") == 2
+
+    asyncio.run(scenario())
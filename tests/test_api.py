@@ -1,5 +1,13 @@
+import asyncio
+from datetime import datetime
+
+import pytest
 from fastapi.testclient import TestClient
+from pydantic_ai.messages import ModelMessagesTypeAdapter, ModelRequest, UserPromptPart
+from zeno import runtime, storage
+from zeno.db import AsyncSessionLocal, dispose_engines
 from zeno.api import app
+from zeno.models import Memory
 
 client = TestClient(app)
 
@@ -14,12 +22,8 @@ def test_get_memories(mocker):
 
 
 def test_agent_endpoints(mocker):
-    # Mock the agent builder functions
-    mock_builder = mocker.patch("zeno.api.build_deduplicator_agent")
-    mocker.patch("zeno.api.build_aggregator_agent")
-    mocker.patch("zeno.api.build_splitter_agent")
-    mocker.patch("zeno.api.build_garbage_collector_agent")
-    mocker.patch("zeno.api.build_reminder_agent")
+    # Mock the agents
+    mocker.patch("zeno.api.run_agent")
 
     endpoints = [
         "/deduplicate",
@@ -35,6 +39,19 @@ def test_agent_endpoints(mocker):
         assert "task_id" in response.json()
 
 
+def test_sharded_endpoints(mocker):
+    run = mocker.patch("zeno.api.run_maintenance_task", return_value="merged")
+
+    response = client.post("/deduplicate?sharded=true&wait=true")
+    assert response.status_code == 200
+    assert response.json() == {"output": "merged"}
+    run.assert_called_with("deduplicator", mode="sharded")
+
+    response = client.post("/aggregate?sharded=true&wait=true")
+    assert response.status_code == 200
+    run.assert_called_with("aggregator", mode="sharded")
+
+
 def test_get_task_status(mocker):
     # Mock the _tasks and _results dictionaries
     mocker.patch.dict("zeno.api._tasks", {"test_task": "dummy_task"})
@@ -48,9 +65,135 @@ def test_get_task_status(mocker):
     assert response.status_code == 404
 
 
-def test_get_old_messages(mocker):
-    # Mock the storage.get_old_messages function
-    mocker.patch("zeno.storage.get_old_messages", return_value=[])
+def test_old_messages_pages_through_both_tiers(db):
+    async def setup() -> None:
+        for i in range(5):
+            await storage.store_message_archive(
+                ModelMessagesTypeAdapter.dump_json(
+                    [ModelRequest(parts=[UserPromptPart(content=f"message {i}")])]
+                )
+            )
+        await storage.compact_message_archive(
+            datetime(2100, 1, 1), delete_before=None, batch_size=2
+        )
+        await storage.store_message_archive(
+            ModelMessagesTypeAdapter.dump_json(
+                [ModelRequest(parts=[UserPromptPart(content="message 5")])]
+            )
+        )
+        await dispose_engines()
+
+    asyncio.run(setup())
+
+    def pages(**params) -> list[list[int]]:
+        seen, cursor = [], None
+        while True:
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/old_messages", params=params).json()
+            seen.append([a["id"] for a in page["archives"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    # pages go back in time, each in chronological order unless newest first
+    assert pages(limit=4, format="json") == [[3, 4, 5, 6], [1, 2]]
+    assert pages(limit=4, format="json", newest_first=True) == [[6, 5, 4, 3], [2, 1]]
+
+    response = client.get("/old_messages", params={"limit": 2})
+    assert response.headers["content-type"].startswith("text/markdown")
+    assert response.text.index("message 4") < response.text.index("message 5")
+    assert "message 3" not in response.text
+    assert "# Archive" not in response.text
+    assert "Next page: `/old_messages?cursor=" in response.text
+    response = client.get("/old_messages", params={"limit": 2, "newest_first": True})
+    assert response.text.index("# Archive 6") < response.text.index("# Archive 5")
+
+    assert client.get("/old_messages", params={"cursor": "nope"}).status_code == 400
+
+
+def test_memories_api_pages_and_revalidates(db):
+    async def setup() -> None:
+        async with AsyncSessionLocal() as session:
+            session.add_all(
+                Memory(
+                    content=f"memory {i}",
+                    created_time=datetime(2025, 1, 1 + i),
+                    relevance=0.2 if i == 3 else 1.0,
+                )
+                for i in range(6)
+            )
+            await session.commit()
+        await dispose_engines()
 
-    response = client.get("/old_messages")
+    asyncio.run(setup())
+
+    params = {"limit": 2, "since": "2025-01-02T00:00:00", "min_relevance": 0.5}
+    first = client.get("/api/memories", params=params)
+    assert [m["content"] for m in first.json()["memories"]] == [
+        "memory 1",
+        "memory 2",
+    ]
+    second = client.get(
+        "/api/memories", params={**params, "cursor": first.json()["next_cursor"]}
+    ).json()
+    assert [m["content"] for m in second["memories"]] == ["memory 4", "memory 5"]
+    assert second["next_cursor"] is None
+
+    etag = first.headers["etag"]
+    cached = client.get("/api/memories", params=params, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    storage.bump_memory_version()
+    fresh = client.get("/api/memories", params=params, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+
+
+def test_search_memories(mocker):
+    memory = Memory(
+        id=3,
+        content="Dentist on Tuesday",
+        created_time=datetime(2025, 1, 2, 9, 30),
+        relevance=1.0,
+    )
+    search = mocker.patch("zeno.storage.search_memories", return_value=[memory])
+
+    response = client.get("/memories/search", params={"q": "dentist", "limit": 5})
     assert response.status_code == 200
+    assert response.json() == [
+        {
+            "content": "Dentist on Tuesday",
+            "relevance": 1.0,
+            "id": 3,
+            "created_time": "2025-01-02T09:30:00",
+        }
+    ]
+    search.assert_called_with("dentist", 5)
+
+
+def test_health(mocker):
+    mocker.patch.dict(runtime._health, clear=True)
+
+    async def fail() -> None:
+        raise RuntimeError("boom")
+
+    async def scenario() -> None:
+        running = asyncio.create_task(runtime.supervise("bot", asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert client.get("/health").json() == {
+            "healthy": True,
+            "tasks": {"bot": mocker.ANY},
+        }
+
+        with pytest.raises(RuntimeError):
+            await runtime.supervise("reminders", fail())
+        response = client.get("/health")
+        assert response.status_code == 503
+        tasks = response.json()["tasks"]
+        assert tasks["bot"]["state"] == "running"
+        assert tasks["reminders"]["state"] == "failed"
+        assert "boom" in tasks["reminders"]["error"]
+        running.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from zeno.db import async_engine, dispose_engines, read_engine
+
+
+def test_sqlite_profile_and_read_only_engine(db):
+    async def scenario() -> None:
+        async with async_engine.connect() as conn:
+            journal = await conn.exec_driver_sql("PRAGMA journal_mode")
+            assert journal.scalar() == "wal"
+            synchronous = await conn.exec_driver_sql("PRAGMA synchronous")
+            assert synchronous.scalar() == 1  # NORMAL
+        async with read_engine.connect() as conn:
+            query_only = await conn.exec_driver_sql("PRAGMA query_only")
+            assert query_only.scalar() == 1
+            with pytest.raises(OperationalError):
+                await conn.exec_driver_sql("DELETE FROM memory")
+        await dispose_engines()
+
+    asyncio.run(scenario())
@@ -0,0 +1,70 @@
+import asyncio
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    UserPromptPart,
+)
+
+from zeno import history, storage
+from zeno.models import HistorySummary
+
+
+def _archive(text: str) -> bytes:
+    return ModelMessagesTypeAdapter.dump_json(
+        [ModelRequest(parts=[UserPromptPart(content=text)])]
+    )
+
+
+def _text(message: ModelMessage) -> str:
+    part = message.parts[0]
+    assert isinstance(part, UserPromptPart) and isinstance(part.content, str)
+    return part.content
+
+
+def test_split_window_fills_budget_newest_first():
+    entries = [
+        storage.HistoryEntry(i, [], tokens) for i, tokens in enumerate([5, 50, 10, 20])
+    ]
+    overflow, window = history.split_window(entries, 40)
+    assert [e.archive_id for e in window] == [2, 3]
+    assert [e.archive_id for e in overflow] == [0, 1]
+    # the newest entry is kept even if it alone exceeds the budget
+    assert history.split_window(entries, 0) == (entries[:3], entries[3:])
+
+
+def test_overflow_is_summarized_in_batches():
+    entries = [
+        storage.HistoryEntry(i, [], tokens)
+        for i, tokens in enumerate([20, 20, 30, 30], start=1)
+    ]
+    # 20 tokens left the window, less than half the budget: keep them
+    assert history.split_unsummarized(entries[1:], 60, None) == ([], entries[1:])
+    assert history.split_unsummarized(entries, 60, None) == (
+        entries[:2],
+        entries[2:],
+    )
+    summary = HistorySummary(content="", last_archive_id=1)
+    assert history.split_unsummarized(entries, 60, summary) == ([], entries[1:])
+
+
+def test_overflow_is_folded_into_summary(db, test_model):
+    async def scenario() -> None:
+        for text in ("old " * 100, "older " * 100, "newest"):
+            await storage.store_message_archive(_archive(text))
+
+        messages, summary = await history.get_chat_history(budget=50)
+        assert [_text(m) for m in messages] == ["newest"]
+        assert summary is None
+
+        assert await history.summarize_overflow(budget=50)
+        # nothing new left the window since
+        assert not await history.summarize_overflow(budget=50)
+
+        _, summary = await history.get_chat_history(budget=50)
+        assert summary is not None
+        stored = await storage.get_history_summary()
+        assert stored is not None and stored.last_archive_id == 2
+
+    asyncio.run(scenario())
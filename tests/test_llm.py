@@ -0,0 +1,22 @@
+import asyncio
+
+from zeno import llm
+
+
+def test_models_are_shared_per_role(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://localhost:1/v1")
+    monkeypatch.setenv("MODEL_NAME", "chat-model")
+    monkeypatch.delenv("MAINTENANCE_MODEL_NAME", raising=False)
+    monkeypatch.setattr(llm.dotenv, "load_dotenv", lambda: None)
+
+    chat = llm.get_model()
+    assert llm.get_model("chat") is chat
+    # without MAINTENANCE_MODEL_NAME maintenance uses the chat model name
+    assert llm.get_model("maintenance").model_name == "chat-model"
+    asyncio.run(llm.close_models())
+
+    monkeypatch.setenv("MAINTENANCE_MODEL_NAME", "cheap-model")
+    assert llm.get_model("maintenance").model_name == "cheap-model"
+    assert llm.get_model("chat") is not chat
+    asyncio.run(llm.close_models())
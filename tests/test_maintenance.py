@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from pydantic_ai import ModelRetry
+
+from zeno import agents, maintenance, storage
+from zeno.models import Memory
+from zeno.tools import (
+    ToolDeps,
+    delete_memories,
+    delete_memory,
+    store_memories,
+    store_memory,
+    unit_of_work,
+)
+
+
+def test_delta_runs_only_on_changes(db, test_model, mocker, tool_ctx):
+    mocker.patch.object(maintenance, "DEDUP_PREFILTER", "none")
+    prompt = mocker.spy(agents, "get_memories_prompt")
+
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "the cat is called Mia")
+        await store_memory(tool_ctx(), "lunch with Anna on friday")
+
+        # no checkpoint yet: the first delta run is a full run
+        assert await maintenance.run_maintenance_task("deduplicator", mode="delta")
+        prompt.assert_called_with(None)
+
+        # nothing changed since: the LLM is not called at all
+        prompt.reset_mock()
+        assert (
+            await maintenance.run_maintenance_task("deduplicator", mode="delta") is None
+        )
+        prompt.assert_not_called()
+
+        await store_memory(tool_ctx(), "the cat Mia likes tuna")
+        await maintenance.run_maintenance_task("deduplicator", mode="delta")
+        memories = prompt.call_args.args[0]
+        changed, related = memories.split("## Related memories")
+        assert "likes tuna" in changed
+        assert "called Mia" in related
+        assert "Anna" not in memories
+
+        # a change set of deletions only leaves nothing to show
+        prompt.reset_mock()
+        await delete_memory(tool_ctx(), 2)
+        assert (
+            await maintenance.run_maintenance_task("deduplicator", mode="delta") is None
+        )
+        prompt.assert_not_called()
+
+    asyncio.run(scenario())
+
+
+def test_partitions_cover_every_memory():
+    memories = [
+        Memory(id=i, content=f"note {i % 7} about topic {i % 3}", created_time=now)
+        for i, now in enumerate(
+            datetime(2025, 1, 1) + timedelta(hours=h) for h in range(25)
+        )
+    ]
+    for partition in (
+        maintenance.partition_by_time,
+        maintenance.partition_by_similarity,
+    ):
+        shards = partition(memories, 10)
+        assert [len(s) for s in shards] == [10, 10, 5]
+        assert sorted(m.id for s in shards for m in s) == list(range(25))
+
+
+def test_sharded_run_merges_shard_edits(db, test_model, mocker, tool_ctx):
+    prompt = mocker.spy(agents, "get_memories_prompt")
+
+    async def scenario() -> None:
+        for i in range(5):
+            await store_memory(tool_ctx(), f"memory number {i}")
+        output = await maintenance.run_maintenance_task(
+            "aggregator", mode="sharded", shard_size=2, concurrency=2
+        )
+        assert output.count("Shard ") == 3
+        # the shards made no edits, so there is nothing to merge
+        assert "Merge" not in output
+        assert prompt.call_count == 3
+
+    asyncio.run(scenario())
+
+
+def test_full_runs_over_the_token_budget_are_sharded(db, test_model, mocker, tool_ctx):
+    mocker.patch.object(maintenance, "MAINTENANCE_TOKEN_BUDGET", 50)
+    prompt = mocker.spy(agents, "get_memories_prompt")
+
+    async def scenario() -> None:
+        for i in range(5):
+            await store_memory(tool_ctx(), f"memory number {i}")
+        output = await maintenance.run_maintenance_task(
+            "garbage_collector", shard_size=2, concurrency=2
+        )
+        # every memory is shown to one of the shards, none is dropped
+        assert output.count("Shard ") == 3
+        shown = "".join(call.args[0] for call in prompt.call_args_list)
+        assert all(f"memory number {i}" in shown for i in range(5))
+
+    asyncio.run(scenario())
+
+
+def test_failing_shard_does_not_stop_the_others(db, mocker, tool_ctx):
+    calls = []
+
+    async def run_agent(name, prompt, deps):
+        calls.append(deps.memory_ids)
+        if 1 in deps.memory_ids:
+            raise RuntimeError("model unavailable")
+        return SimpleNamespace(output="ok")
+
+    mocker.patch.object(maintenance, "run_agent", side_effect=run_agent)
+
+    async def scenario() -> None:
+        for i in range(5):
+            await store_memory(tool_ctx(), f"memory number {i}")
+        output = await maintenance.run_maintenance_task(
+            "aggregator", mode="sharded", shard_size=2, concurrency=2
+        )
+        assert len(calls) == 3
+        assert "Shard 1 failed: RuntimeError('model unavailable')" in output
+        assert "Shard 3: ok" in output
+        checkpoint = await storage.get_maintenance_checkpoint("aggregator")
+        assert checkpoint is not None
+        assert checkpoint.last_full_time is None
+
+    asyncio.run(scenario())
+
+
+def test_deduplicator_only_sees_candidate_clusters(db, test_model, mocker, tool_ctx):
+    prompt = mocker.spy(agents, "get_memories_prompt")
+
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Dentist appointment on 2025-03-04 at 10:00")
+        await store_memory(tool_ctx(), "The user's favourite colour is green")
+        # without a recent unfiltered pass every memory is shown, so
+        # contradictions can be found too
+        assert await maintenance.run_maintenance_task("deduplicator")
+        # no prerendered candidates: the prompt gets the whole memory table
+        assert prompt.call_args.args[0] is None
+        prompt.reset_mock()
+
+        assert await maintenance.run_maintenance_task("deduplicator") is None
+        prompt.assert_not_called()
+
+        await store_memory(tool_ctx(), "Dentist appointment on 2025-03-04 at 10:00.")
+        assert await maintenance.run_maintenance_task("deduplicator")
+        memories = prompt.call_args.args[0]
+        assert memories is not None
+        assert memories.count("Dentist") == 2
+        assert "green" not in memories
+
+    asyncio.run(scenario())
+
+
+def test_tools_reject_memories_outside_the_shard(db, tool_ctx):
+    ctx = tool_ctx(ToolDeps(memory_ids={1}))
+    with pytest.raises(ModelRetry):
+        asyncio.run(delete_memory(ctx, 2))
+
+
+def test_unit_of_work_commits_once_or_not_at_all(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "outdated fact")
+        deps = ToolDeps()
+        ctx = tool_ctx(deps)
+
+        async with unit_of_work(deps):
+            await delete_memory(ctx, 1)
+            await store_memory(ctx, "merged fact")
+            # nothing is written before the run finishes
+            assert len(await storage.get_memory_rows()) == 1
+        assert [m.content for m in await storage.get_memory_rows()] == ["merged fact"]
+
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(deps):
+                await store_memory(ctx, "half applied")
+                raise RuntimeError("agent failed")
+        assert len(await storage.get_memory_rows()) == 1
+        assert deps.writes is None
+
+    asyncio.run(scenario())
+
+
+def test_bulk_tools_write_in_one_statement(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memories(tool_ctx(), ["a fact", "b fact", "c fact"])
+        rows = await storage.get_memory_rows()
+        assert [m.content for m in rows] == ["a fact", "b fact", "c fact"]
+        a, b, c = (cast(int, m.id) for m in rows)
+        assert await storage.get_latest_change_id() == 3
+
+        await delete_memories(tool_ctx(), [a, c, 99])
+        assert [m.content for m in await storage.get_memory_rows()] == ["b fact"]
+        assert "a fact" not in await storage.get_memories(True)
+
+        ctx = tool_ctx(ToolDeps(memory_ids={b}))
+        with pytest.raises(ModelRetry):
+            await delete_memories(ctx, [b, 42])
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+from zeno.minhash import MinHashLSH, candidate_clusters
+
+
+def test_near_duplicates_are_clustered():
+    texts = [
+        (1, "Call mom every Sunday evening"),
+        (2, "The user prefers tea over coffee"),
+        (3, "call mom every sunday  evening!"),
+        (4, "Weekly team meeting moved to Thursday 14:00"),
+        (5, "The user prefers tea over coffee in the morning"),
+    ]
+    assert candidate_clusters(texts) == [[1, 3], [2, 5]]
+
+
+def test_unrelated_texts_have_no_candidates():
+    texts = [
+        (1, "Buy oat milk and bread on the way home"),
+        (2, "Passport expires in November 2027"),
+        (3, "Likes hiking in the Alps during summer"),
+        (4, "Anna's birthday is on the 12th of May"),
+    ]
+    assert candidate_clusters(texts) == []
+
+
+def test_signature_is_deterministic():
+    assert MinHashLSH().signature("hello world") == MinHashLSH().signature(
+        "Hello   World"
+    )
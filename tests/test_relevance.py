@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from zeno import relevance, storage
+from zeno.db import AsyncSessionLocal
+from zeno.models import Memory
+
+NOW = datetime(2026, 1, 1)
+
+
+def test_scores_combine_recency_access_and_reminders():
+    memories = [
+        Memory(id=1, content="new fact", created_time=NOW, access_count=0),
+        Memory(
+            id=2,
+            content="old fact",
+            created_time=NOW - timedelta(days=90),
+            access_count=0,
+        ),
+        Memory(
+            id=3,
+            content="old but used",
+            created_time=NOW - timedelta(days=365),
+            access_count=10,
+        ),
+        Memory(
+            id=4,
+            content="Remind me to renew the passport",
+            created_time=NOW - timedelta(days=365),
+            access_count=0,
+        ),
+        Memory(
+            id=5,
+            content="old, retrieved yesterday",
+            created_time=NOW - timedelta(days=365),
+            last_accessed=NOW - timedelta(days=1),
+            access_count=1,
+        ),
+    ]
+    scores = relevance.score_memories(memories, NOW, half_life_days=90, saturation=10)
+    assert scores[1] == 1.0
+    assert scores[2] == 0.5
+    assert scores[3] == 1.0
+    assert scores[4] == 1.0
+    assert scores[5] > 0.99
+
+
+def test_rescoring_drops_stale_memories_from_prompts(db):
+    async def scenario() -> None:
+        async with AsyncSessionLocal() as session:
+            session.add_all(
+                [
+                    Memory(content="likes green tea", created_time=NOW),
+                    Memory(content="green car", created_time=NOW - timedelta(days=900)),
+                ]
+            )
+            await session.commit()
+
+        await storage.record_memory_access([1])
+        assert (await storage.get_memory_rows())[1].access_count == 1
+
+        assert await relevance.rescore_memories() == 1
+        assert await relevance.rescore_memories() == 0
+        assert "green car" in await storage.get_memories(False)
+        assert "green car" not in await storage.get_memories(False, min_relevance=0.1)
+        ordered = await storage.get_memories(False, by_relevance=True)
+        assert ordered.index("green tea") < ordered.index("green car")
+
+        found = await storage.get_relevant_memories("green", 10, min_relevance=0.1)
+        assert [m.content for m in found] == ["likes green tea"]
+
+    asyncio.run(scenario())
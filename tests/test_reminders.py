@@ -0,0 +1,190 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from pydantic_ai import ModelRetry
+from pydantic_ai.messages import ModelRequest
+
+from zeno import agents, reminders, storage
+from zeno.tools import (
+    ToolDeps,
+    create_reminder,
+    send_reminder,
+    store_memory,
+    unit_of_work,
+    update_memory,
+)
+from zeno.utils import next_occurrence
+
+
+def test_next_occurrence():
+    due = datetime(2025, 1, 31, 9, 0)
+    assert next_occurrence(due, "daily", datetime(2025, 1, 30)) == due
+    assert next_occurrence(due, "daily", due) == datetime(2025, 2, 1, 9, 0)
+    assert next_occurrence(due, "weekly", datetime(2025, 2, 20, 12)) == datetime(
+        2025, 2, 21, 9, 0
+    )
+    assert next_occurrence(due, "monthly", due) == datetime(2025, 2, 28, 9, 0)
+    assert next_occurrence(due, "monthly", datetime(2025, 3, 1)) == datetime(
+        2025, 3, 31, 9, 0
+    )
+    assert next_occurrence(due, "yearly", due) == datetime(2026, 1, 31, 9, 0)
+    with pytest.raises(ValueError):
+        next_occurrence(due, "fortnightly", due)
+
+
+def test_create_reminder_validates_input(db, tool_ctx):
+    with pytest.raises(ModelRetry):
+        asyncio.run(create_reminder(tool_ctx(), "x", "tomorrow"))
+    with pytest.raises(ModelRetry):
+        asyncio.run(create_reminder(tool_ctx(), "x", "2025-01-01T09:00", "fortnightly"))
+
+
+def test_due_reminders_are_sent_and_rescheduled(db, mocker, tool_ctx):
+    deliver = mocker.patch("zeno.reminders.deliver_message")
+    now = datetime(2025, 5, 5, 12, 0)
+    mocker.patch("zeno.reminders.get_current_naive_time", return_value=now)
+
+    async def scenario() -> None:
+        await create_reminder(
+            tool_ctx(), "Take out the trash", "2025-05-05T08:00", "daily"
+        )
+        await create_reminder(tool_ctx(), "Call the bank", "2025-05-05T11:55")
+        await create_reminder(tool_ctx(), "Dentist", "2025-05-06T10:00")
+
+        assert await reminders.process_due_reminders("direct") == 2
+        assert [c.args[0] for c in deliver.call_args_list] == [
+            "Take out the trash",
+            "Call the bank",
+        ]
+
+        # nothing is due any more until tomorrow
+        assert await storage.get_due_reminders(now) == []
+        (daily,) = await storage.get_due_reminders(datetime(2025, 5, 6, 8, 0))
+        assert daily.due_at == datetime(2025, 5, 6, 8, 0)
+        assert daily.last_sent_at == now
+
+    asyncio.run(scenario())
+
+
+def test_agent_delivery_marks_only_sent_reminders(db, mocker, tool_ctx):
+    deliver = mocker.patch("zeno.reminders.deliver_message")
+    now = datetime(2025, 5, 5, 12, 0)
+    mocker.patch("zeno.reminders.get_current_naive_time", return_value=now)
+
+    async def run_agent(name: str, prompt: str, deps: ToolDeps) -> SimpleNamespace:
+        assert deps.due is not None and deps.delivered is not None
+        assert "ID 1, 2025-05-05 08:00 (daily): Take out the trash" in deps.due
+        # the agent only gets around to the first reminder
+        deps.delivered.add(1)
+        return SimpleNamespace(output="sent")
+
+    mocker.patch("zeno.reminders.run_agent", side_effect=run_agent)
+
+    async def scenario() -> None:
+        await create_reminder(
+            tool_ctx(), "Take out the trash", "2025-05-05T08:00", "daily"
+        )
+        await create_reminder(tool_ctx(), "Call the bank", "2025-05-05T11:55")
+
+        assert await reminders.process_due_reminders("agent") == 2
+        # the reminder the agent skipped is sent as is
+        assert [c.args[0] for c in deliver.call_args_list] == ["Call the bank"]
+        assert await storage.get_due_reminders(now) == []
+
+    asyncio.run(scenario())
+
+
+def test_memory_scan_sees_scheduled_reminders(db, test_model, tool_ctx):
+    async def scenario() -> None:
+        await create_reminder(tool_ctx(), "Dentist", "2025-05-06T10:00")
+        res = await agents.run_agent("reminder", "Check for due reminders")
+        request = res.all_messages()[0]
+        assert isinstance(request, ModelRequest) and request.instructions
+        instructions = request.instructions
+        assert "# Scheduled Reminders" in instructions
+        assert "ID 1, 2025-05-06 10:00: Dentist" in instructions
+
+    asyncio.run(scenario())
+
+
+def test_memory_scan_only_runs_for_changed_reminder_memories(db, mocker, tool_ctx):
+    async def run_agent(name: str, prompt: str) -> SimpleNamespace:
+        # the scan marks the reminder it sent
+        await store_memory(tool_ctx(), "Reminder sent: water the plants, 2025-05-05")
+        return SimpleNamespace(output="sent")
+
+    scan = mocker.patch("zeno.reminders.run_agent", side_effect=run_agent)
+
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Likes jazz, especially Coltrane")
+        assert await reminders.scan_reminder_memories(force=False) is None
+        await store_memory(tool_ctx(), "Remind me to water the plants every Monday")
+        assert await reminders.scan_reminder_memories(force=False) == "sent"
+        # neither the reminder nor the existing "reminder sent" memory is news
+        assert await reminders.scan_reminder_memories(force=False) is None
+        assert scan.call_count == 1
+
+        await update_memory(tool_ctx(), 2, "Remind me to water the plants on Tuesdays")
+        assert await reminders.scan_reminder_memories(force=False) == "sent"
+        assert await reminders.scan_reminder_memories(force=True) == "sent"
+        assert scan.call_count == 3
+
+    asyncio.run(scenario())
+
+
+def test_send_reminder_refuses_scheduled_reminders(db, mocker, tool_ctx):
+    deliver = mocker.patch("zeno.tools.deliver_message")
+    now = datetime(2025, 5, 5, 12, 0)
+    mocker.patch("zeno.tools.get_current_naive_time", return_value=now)
+
+    async def scenario() -> None:
+        await create_reminder(tool_ctx(), "Take out the trash", "2025-05-05T12:10")
+        # the scheduler sends this one, a memory scan must not send it again
+        with pytest.raises(ModelRetry):
+            await send_reminder(tool_ctx(), "Take out the trash!")
+        await send_reminder(tool_ctx(), "Water the plants")
+        # the reminder agent delivering a due reminder passes its id
+        await send_reminder(tool_ctx(), "Take out the trash", reminder_id=1)
+        assert [c.args[0] for c in deliver.call_args_list] == [
+            "Water the plants",
+            "Take out the trash",
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_reminder_rows_roll_back_with_the_run(db, tool_ctx):
+    async def scenario() -> None:
+        deps = ToolDeps()
+        ctx = tool_ctx(deps)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(deps):
+                await create_reminder(ctx, "Dentist", "2025-05-06T10:00")
+                raise RuntimeError("agent failed")
+        assert await storage.get_scheduled_reminders(10) == []
+
+    asyncio.run(scenario())
+
+
+def test_reminder_agent_keeps_sent_markers_when_it_fails(db, mocker, tool_ctx):
+    mocker.patch("zeno.tools.deliver_message")
+
+    class FailingAgent:
+        async def run(self, prompt: str, deps: ToolDeps) -> None:
+            ctx = tool_ctx(deps)
+            await send_reminder(ctx, "Water the plants")
+            await store_memory(ctx, "Sent the plants reminder today")
+            raise RuntimeError("model error")
+
+    mocker.patch.object(agents, "get_agent", return_value=FailingAgent())
+
+    async def scenario() -> None:
+        with pytest.raises(RuntimeError):
+            await agents.run_agent("reminder", "Check for due reminders")
+        # the reminder went out, so the marker must not be lost
+        rows = await storage.get_memory_rows()
+        assert [m.content for m in rows] == ["Sent the plants reminder today"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from zeno import storage
+from zeno.scheduler import ReminderScheduler
+from zeno.tools import create_reminder
+
+
+def test_sleeps_until_earliest_due_time():
+    scheduler = ReminderScheduler(max_sleep=600)
+    now = datetime(2025, 1, 1, 12, 0)
+    assert scheduler.seconds_until_next(now) == 600
+
+    scheduler._next_due = now + timedelta(seconds=90)
+    assert scheduler.seconds_until_next(now) == 90
+    scheduler._next_due = now - timedelta(minutes=5)
+    assert scheduler.seconds_until_next(now) == 0
+    scheduler._next_due = now + timedelta(days=1)
+    assert scheduler.seconds_until_next(now) == 600
+
+
+def test_notify_wakes_the_scheduler(db):
+    scheduler = ReminderScheduler(max_sleep=3600)
+    calls = 0
+
+    async def deliver() -> int:
+        nonlocal calls
+        calls += 1
+        return 0
+
+    async def scenario() -> None:
+        task = asyncio.create_task(scheduler.run(deliver))
+        await asyncio.sleep(0.1)
+        assert calls == 1
+
+        scheduler.notify()
+        await asyncio.sleep(0.1)
+        assert calls == 2
+
+        # writes from another thread (e.g. the bot) wake it as well
+        threading.Thread(target=scheduler.notify).start()
+        await asyncio.sleep(0.1)
+        assert calls == 3
+        task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_reload_looks_up_the_earliest_pending_reminder(db, tool_ctx):
+    scheduler = ReminderScheduler(max_sleep=3600)
+    now = datetime(2025, 5, 5, 12, 0)
+
+    async def scenario() -> None:
+        await scheduler.reload()
+        assert scheduler.seconds_until_next(now) == 3600
+        await create_reminder(tool_ctx(), "Dentist", "2025-05-05T12:30")
+        await create_reminder(tool_ctx(), "Call the bank", "2025-05-05T12:05")
+        await scheduler.reload()
+        assert scheduler.seconds_until_next(now) == 300
+
+        # a sent one-time reminder is no longer pending
+        await storage.mark_reminder_sent(2, now, None)
+        await scheduler.reload()
+        assert scheduler.seconds_until_next(now) == 1800
+
+    asyncio.run(scenario())
@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    UserPromptPart,
+)
+
+from sqlalchemy import func, select, update
+
+from zeno import storage
+from zeno.db import AsyncSessionLocal
+from zeno.models import MessageArchive, MessageArchiveCold
+from zeno.tools import delete_memory, store_memory, update_memory
+
+
+def test_memories_cache_invalidated_by_tools(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "likes tea")
+        before = storage.get_memories_cache_stats()
+
+        first = await storage.get_memories(True)
+        second = await storage.get_memories(True)
+        assert first == second
+        assert "likes tea" in first
+
+        stats = storage.get_memories_cache_stats()
+        assert stats["misses"] == before["misses"] + 1
+        assert stats["hits"] == before["hits"] + 1
+
+        await delete_memory(tool_ctx(), 1)
+        assert "likes tea" not in await storage.get_memories(True)
+
+    asyncio.run(scenario())
+
+
+def test_search_memories_ranks_by_bm25(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Dentist appointment next Tuesday")
+        await store_memory(tool_ctx(), "Favourite food is pizza")
+        await store_memory(tool_ctx(), "Dentist is Dr. Weber, dentist office in Mitte")
+        await update_memory(tool_ctx(), 2, "Favourite food is sushi")
+
+        found = await storage.search_memories("dentist", 10)
+        assert [m.id for m in found] == [3, 1]
+
+        assert await storage.search_memories("pizza", 10) == []
+        assert [m.id for m in await storage.search_memories("sushi", 10)] == [2]
+        # FTS5 syntax in user input is treated as plain words
+        assert await storage.search_memories('"AND (* NEAR', 10) == []
+        # stopwords and very short words don't match anything
+        assert [
+            m.id for m in await storage.search_memories("what is the food", 10)
+        ] == [2]
+
+        await delete_memory(tool_ctx(), 3)
+        assert [m.id for m in await storage.search_memories("dentist", 10)] == [1]
+
+    asyncio.run(scenario())
+
+
+def test_relevant_memories_pin_reminders(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Remind me to water the plants every Monday")
+        await store_memory(tool_ctx(), "Likes jazz, especially Coltrane")
+        await store_memory(tool_ctx(), "Sister lives in Hamburg")
+        await store_memory(tool_ctx(), "Wants to visit Hamburg harbour in spring")
+
+        found = await storage.get_relevant_memories("trip to Hamburg?", 10)
+        # the pinned reminder comes first, the jazz memory doesn't match
+        assert found[0].id == 1
+        assert {m.id for m in found[1:]} == {3, 4}
+
+    asyncio.run(scenario())
+
+
+def test_german_reminders_are_pinned(db, tool_ctx):
+    async def scenario() -> None:
+        await store_memory(tool_ctx(), "Erinnere mich jeden Montag an die Pflanzen")
+        await store_memory(tool_ctx(), "Likes jazz, especially Coltrane")
+
+        found = await storage.get_relevant_memories("trip to Hamburg?", 10)
+        assert [m.id for m in found] == [1]
+        assert storage.is_pinned(found[0])
+
+    asyncio.run(scenario())
+
+
+def _archive(text: str) -> bytes:
+    return ModelMessagesTypeAdapter.dump_json(
+        [ModelRequest(parts=[UserPromptPart(content=text)])]
+    )
+
+
+def _text(message: ModelMessage) -> str:
+    part = message.parts[0]
+    assert isinstance(part, UserPromptPart) and isinstance(part.content, str)
+    return part.content
+
+
+def test_message_history_is_served_from_memory(db, mocker):
+    async def scenario() -> None:
+        await storage.store_message_archive(_archive("first"))
+        await storage.load_message_history()
+
+        await storage.store_message_archive(_archive("second"))
+        parse = mocker.spy(storage.ModelMessagesTypeAdapter, "validate_json")
+        messages = await storage.get_old_messages(10)
+        assert [_text(m) for m in messages] == ["first", "second"]
+        parse.assert_not_called()
+
+        # requests beyond the buffer read the database
+        big = await storage.get_old_messages(storage.MESSAGE_HISTORY_SIZE + 1)
+        assert [_text(m) for m in big] == ["first", "second"]
+
+    asyncio.run(scenario())
+
+
+def test_old_archives_are_compressed_and_expired(db):
+    async def scenario() -> None:
+        for text, days in (("ancient", 400), ("old", 30), ("recent", 0)):
+            await storage.store_message_archive(_archive(text))
+            latest = select(func.max(MessageArchive.id)).scalar_subquery()
+            async with AsyncSessionLocal() as session:
+                await session.execute(
+                    update(MessageArchive)
+                    .where(MessageArchive.id == latest)
+                    .values(created_time=datetime(2026, 1, 1) - timedelta(days=days))
+                )
+                await session.commit()
+
+        compressed, deleted = await storage.compact_message_archive(
+            datetime(2025, 12, 25), delete_before=datetime(2025, 1, 1)
+        )
+        assert (compressed, deleted) == (2, 0)
+        await storage.incremental_vacuum()
+
+        # both tiers are read transparently, in order; the ancient archive
+        # isn't in the summary yet, so it wasn't deleted
+        await storage.load_message_history()
+        messages = await storage.get_old_messages(10)
+        assert [_text(m) for m in messages] == ["ancient", "old", "recent"]
+
+        await storage.set_history_summary("talked about ancient things", 1)
+        assert await storage.compact_message_archive(
+            datetime(2025, 12, 25), delete_before=datetime(2025, 1, 1)
+        ) == (0, 1)
+        await storage.load_message_history()
+        messages = await storage.get_old_messages(10)
+        assert [_text(m) for m in messages] == ["old", "recent"]
+
+    asyncio.run(scenario())
+
+
+def test_compaction_never_reuses_archive_ids(db):
+    async def scenario() -> None:
+        for text in ("first", "second"):
+            await storage.store_message_archive(_archive(text))
+        # move every archive, the newest one included, to the cold table
+        assert await storage.compact_message_archive(datetime.max, None) == (2, 0)
+
+        await storage.store_message_archive(_archive("third"))
+        assert await storage.compact_message_archive(datetime.max, None) == (1, 0)
+        async with AsyncSessionLocal() as session:
+            ids = (await session.execute(select(MessageArchiveCold.id))).scalars()
+            assert sorted(ids) == [1, 2, 3]
+
+    asyncio.run(scenario())
@@ -0,0 +1,126 @@
+import asyncio
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from zeno import config, storage
+from zeno.telegram_bot import StreamingReply, run_chat_agent
+
+
+def _fake_bot(mocker):
+    bot = mocker.AsyncMock()
+    bot.send_message.return_value = SimpleNamespace(message_id=7)
+    return bot
+
+
+def _update(chat_id: int, text: str) -> Update:
+    """Fake the parts of an update the chat handler reads."""
+    return cast(
+        Update,
+        SimpleNamespace(
+            effective_chat=SimpleNamespace(id=chat_id),
+            message=SimpleNamespace(text=text, from_user=SimpleNamespace(id=1)),
+        ),
+    )
+
+
+def _context(bot) -> ContextTypes.DEFAULT_TYPE:
+    return cast(ContextTypes.DEFAULT_TYPE, SimpleNamespace(bot=bot))
+
+
+def test_chat_reply_is_streamed_into_the_placeholder(db, test_model, mocker):
+    test_model.custom_output_text = "the cat is called Mia and likes tuna"
+    mocker.patch.object(config, "CHAT_STREAM_EDIT_INTERVAL", 0.0)
+    mocker.patch.object(config, "CHAT_DEBOUNCE_SECONDS", 0.0)
+    bot = _fake_bot(mocker)
+    update = _update(1, "what is my cat called?")
+
+    asyncio.run(run_chat_agent(update, _context(bot)))
+
+    bot.send_message.assert_called_once_with(chat_id=1, text=StreamingReply.PLACEHOLDER)
+    shown = [c.args[0] for c in bot.edit_message_text.call_args_list]
+    # partial texts first, then the full reply, each shown once
+    assert len(shown) > 1
+    assert shown[-1] == "the cat is called Mia and likes tuna"
+    assert len(set(shown)) == len(shown)
+    bot.delete_message.assert_not_called()
+    assert storage._message_history is not None
+    assert len(storage._message_history) == 1
+
+
+def test_long_reply_falls_back_to_split_messages(mocker):
+    bot = _fake_bot(mocker)
+
+    async def scenario() -> None:
+        reply = StreamingReply(bot, 1, interval=60.0)
+        await reply.start()
+        # throttled: the interval hasn't passed since the placeholder was sent
+        await reply.update("first tokens")
+        await reply.finish("word " * 1200)
+
+    asyncio.run(scenario())
+    bot.edit_message_text.assert_not_called()
+    bot.delete_message.assert_called_once_with(chat_id=1, message_id=7)
+    # the placeholder plus the two parts of the split reply
+    assert bot.send_message.call_count == 3
+
+
+def test_failed_placeholder_leaves_no_typing_loop(mocker):
+    bot = _fake_bot(mocker)
+    bot.send_message.side_effect = TelegramError("network down")
+    reply = StreamingReply(bot, 1, interval=1.0)
+
+    async def scenario() -> None:
+        with pytest.raises(TelegramError):
+            await reply.start()
+        assert reply._typing is None
+
+    asyncio.run(scenario())
+    bot.send_chat_action.assert_not_called()
+
+
+def test_bursts_are_coalesced_and_chats_run_in_parallel(mocker):
+    mocker.patch.object(config, "CHAT_DEBOUNCE_SECONDS", 0.05)
+    answered: list[tuple[int, str]] = []
+    running: dict[int, int] = {1: 0, 2: 0}
+    overlap = {"same_chat": False, "other_chats": False}
+
+    async def answer(bot, chat_id: int, text: str) -> None:
+        running[chat_id] += 1
+        overlap["same_chat"] |= running[chat_id] > 1
+        await asyncio.sleep(0.1)
+        overlap["other_chats"] |= all(running.values())
+        answered.append((chat_id, text))
+        running[chat_id] -= 1
+
+    mocker.patch("zeno.telegram_bot._answer", side_effect=answer)
+
+    bot = _fake_bot(mocker)
+
+    async def send(chat_id: int, text: str, after: float) -> None:
+        await asyncio.sleep(after)
+        await run_chat_agent(_update(chat_id, text), _context(bot))
+
+    async def scenario() -> None:
+        await asyncio.gather(
+            send(1, "hi", 0),
+            send(1, "I have a question", 0.02),
+            send(2, "hello", 0.03),
+            # arrives while the first run of chat 1 is in flight
+            send(1, "about my cat", 0.12),
+        )
+
+    asyncio.run(scenario())
+    assert [text for chat_id, text in answered if chat_id == 1] == [
+        "hi\nI have a question",
+        "about my cat",
+    ]
+    assert [text for chat_id, text in answered if chat_id == 2] == ["hello"]
+    assert overlap == {"same_chat": False, "other_chats": True}
+    # a typing action right away for each burst, not for every message
+    typing = [c.kwargs["chat_id"] for c in bot.send_chat_action.call_args_list]
+    assert sorted(typing) == [1, 2]
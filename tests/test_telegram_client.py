@@ -0,0 +1,23 @@
+import asyncio
+
+from telegram.ext import ExtBot
+
+from zeno import telegram_client
+from zeno.telegram_bot import build_application
+
+
+def test_bot_is_shared(monkeypatch, mocker):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123:abc")
+    monkeypatch.setattr(telegram_client, "_bot", None)
+    initialize = mocker.patch.object(ExtBot, "initialize")
+    shutdown = mocker.patch.object(ExtBot, "shutdown")
+
+    async def scenario() -> None:
+        bot = await telegram_client.get_bot()
+        assert await telegram_client.get_bot() is bot
+        assert build_application(telegram_client.shared_bot()).bot is bot
+        await telegram_client.close_bot()
+
+    asyncio.run(scenario())
+    assert initialize.call_count == 2
+    shutdown.assert_called_once()
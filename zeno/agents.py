@@ -1,15 +1,35 @@
-import os
+import contextlib
+import logging
+from typing import Any, Awaitable, Callable, cast
 
-import dotenv
-from pydantic_ai import Agent
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.agent import AgentRunResult
 from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.toolsets import FunctionToolset
 
-from . import storage
-from .tools import delete_memory, send_reminder, store_memory, update_memory
+from . import llm, storage
+from .config import (
+    CHAT_MEMORY_MODE,
+    CHAT_MEMORY_TOKEN_BUDGET,
+    CHAT_MEMORY_TOP_K,
+    CHAT_PINNED_TOKEN_BUDGET,
+    MEMORY_MIN_RELEVANCE,
+)
+from .tools import (
+    ToolDeps,
+    create_reminder,
+    delete_memories,
+    delete_memory,
+    send_reminder,
+    store_memories,
+    store_memory,
+    unit_of_work,
+    update_memory,
+)
 from .utils import get_current_time
 
+logger = logging.getLogger("zeno.agents")
+
 cleanerprefix = """# RULES
 You are an agent tasked with cleaning up the memories of another agentic system.
 The memories are all sorted by the time they were created.
@@ -20,11 +40,38 @@ tooldescriptions = {
 Use this to delete a memory via its ID. Be very careful and conservative when deleting memories. When in doubt, then keep the memory. When in doubt, do not delete.""",
     "store": """## Save Memory
 Use this tool to store information about the user. Extract and summarize interesting information from the user message and pass it to this tool.""",
+    "delete_many": """## Delete Memories
+Use this to delete several memories at once via a list of IDs. Prefer it over calling Delete Memory repeatedly. The same caution applies: only delete memories you are sure about.""",
+    "store_many": """## Save Memories
+Use this to store several new memories at once, one per content. Prefer it over calling Save Memory repeatedly.""",
     "update": """## Update Memory
 Use this tool to update an existing memory by its ID. Provide the memory ID and the new content to replace the existing memory.""",
+    "reminder": """## Create Reminder
+Use this tool to schedule a reminder message for the user. Provide the message, the local date and time it is due in ISO format (e.g. 2025-03-04T09:00) and, for repeating reminders, a recurrence of hourly, daily, weekly, monthly or yearly. The reminder is then sent automatically at the right time.""",
 }
 
 
+# Token budget of the memories section of the chat and reminder prompts, so a
+# growing memory table can't push them past the model's context. Maintenance
+# agents are not packed: dropping the least relevant memories would hide
+# exactly the stale ones they have to clean up, so zeno.maintenance shards
+# runs that would exceed MAINTENANCE_TOKEN_BUDGET instead.
+MEMORY_TOKEN_BUDGETS: dict[str, int] = {
+    "chat": CHAT_MEMORY_TOKEN_BUDGET,
+    "reminder": 8_000,
+}
+
+# Pending scheduled reminders shown to the reminder agent, so it doesn't send
+# them again when a memory mentions them.
+SCHEDULED_REMINDERS_SHOWN = 50
+
+# Agents whose memory writes record side effects that can't be undone: the
+# reminder agent marks reminders as sent right after sending them, so a run
+# failing later must not drop the marker. Their writes are applied at once
+# instead of in a unit of work.
+UNBUFFERED_AGENTS = {"reminder"}
+
+
 def get_time_prompt() -> str:
     now = get_current_time()
     return f"""
@@ -34,8 +81,36 @@ The current time is {now.strftime("%H:%M:%S")} (European)
 """
 
 
-async def get_memories_prompt() -> str:
-    mdmemories = await storage.get_memories(True)
+async def get_memories_prompt(
+    mdmemories: str | None = None,
+    min_relevance: float = 0.0,
+    budget: int | None = None,
+    pinned_budget: int | None = None,
+) -> str:
+    """Render the memories section of an agent prompt.
+
+    `mdmemories` replaces the full memory dump, e.g. with the subset of
+    memories a delta maintenance run should look at. Otherwise memories with
+    a relevance below `min_relevance` are left out and, given a token
+    `budget`, only the most valuable memories fitting into it are shown, with
+    pinned memories capped at `pinned_budget` tokens.
+    """
+    if mdmemories is None and budget is not None:
+        packed = await storage.get_packed_memories(budget, min_relevance, pinned_budget)
+        mdmemories = storage.render_memories(packed.selected, True)
+        if packed.dropped:
+            logger.info(
+                "%d memories (~%d tokens) did not fit the %d token budget",
+                len(packed.dropped),
+                sum(storage.memory_tokens(m) for m in packed.dropped),
+                budget,
+            )
+            mdmemories += (
+                f"\n\n({len(packed.dropped)} older or less relevant memories "
+                "were left out to keep this prompt short.)"
+            )
+    elif mdmemories is None:
+        mdmemories = await storage.get_memories(True, min_relevance)
 
     return f"""
 # Memories
@@ -51,27 +126,100 @@ Here are the Memories in Markdown format:
 **end of memories**"""
 
 
-def get_openai_model() -> OpenAIModel:
-    # Load environment when the model is needed to avoid import-time side-effects.
-    dotenv.load_dotenv()
+def get_openai_model(role: str = "chat") -> OpenAIModel:
+    """Return the shared model for `role`, see zeno.llm."""
+    return llm.get_model(role)
+
 
-    openai_model = OpenAIModel(
-        os.environ["MODEL_NAME"],
-        provider=OpenAIProvider(
-            api_key=os.environ["OPENAI_API_KEY"],
-            base_url=os.environ["OPENAI_BASE_URL"],
-        ),
+async def get_relevant_memories_text(query: str, record_access: bool = False) -> str:
+    """Render the memories relevant to `query` within the chat token budget.
+
+    Pinned memories come first in the selection but may only use
+    CHAT_PINNED_TOKEN_BUDGET of the budget, so plenty of reminders can't push
+    out the memories matching the conversation. With `record_access` the selected memories
+    get a retrieval hit, which raises their relevance score.
+    """
+    memories = await storage.get_relevant_memories(
+        query, CHAT_MEMORY_TOP_K, MEMORY_MIN_RELEVANCE
+    )
+    selected, _ = storage.pack_memories(
+        memories, MEMORY_TOKEN_BUDGETS["chat"], CHAT_PINNED_TOKEN_BUDGET
+    )
+    if record_access:
+        await storage.record_memory_access(cast(int, m.id) for m in selected)
+    return (
+        "Only the memories most relevant to the current conversation are shown.\n\n"
+        + storage.render_memories(selected, True)
     )
-    return openai_model
 
 
-async def build_chat_agent() -> Agent:
-    mdmem = await get_memories_prompt()
+async def _maintenance_memories_instructions(ctx: RunContext[ToolDeps]) -> str:
+    # every memory, or the subset of a delta, shard or duplicate candidate run
+    return await get_memories_prompt(ctx.deps.memories)
+
+
+async def _chat_memories_instructions(ctx: RunContext[ToolDeps]) -> str:
+    # With CHAT_MEMORY_MODE=retrieval and a query (the incoming message and
+    # recent history), only memories relevant to it are put into the prompt.
+    deps = ctx.deps
+    if deps.query is not None and CHAT_MEMORY_MODE == "retrieval":
+        # instructions are rendered before every model request of a run;
+        # only the first one counts as a retrieval hit
+        text = await get_relevant_memories_text(
+            deps.query, record_access=ctx.run_step == 0
+        )
+        return await get_memories_prompt(text)
+    return await get_memories_prompt(
+        deps.memories,
+        MEMORY_MIN_RELEVANCE,
+        MEMORY_TOKEN_BUDGETS["chat"],
+        CHAT_PINNED_TOKEN_BUDGET,
+    )
+
+
+def _chat_summary_instructions(ctx: RunContext[ToolDeps]) -> str:
+    summary = ctx.deps.summary
+    if summary is None:
+        return ""
+    return f"""# Earlier conversation
+The chat history below only contains the latest messages. This is a summary of the conversation before them:
+
+{summary}"""
 
-    def get_chat_instructions() -> str:
-        return f"""# RULES
+
+async def _reminder_memories_instructions(ctx: RunContext[ToolDeps]) -> str:
+    deps = ctx.deps
+    mdmem = await get_memories_prompt(
+        deps.memories, MEMORY_MIN_RELEVANCE, MEMORY_TOKEN_BUDGETS["reminder"]
+    )
+    if deps.due is not None:
+        mdmem += f"""
+
+# Due Reminders
+These scheduled reminders are due now. Send each of them, phrased naturally and using the memories for context, and pass its ID to the Send Reminder tool.
+
+{deps.due}"""
+    scheduled = await storage.get_scheduled_reminders(SCHEDULED_REMINDERS_SHOWN)
+    if scheduled:
+        mdmem += f"""
+
+# Scheduled Reminders
+These reminders are sent automatically when they are due. Never send them yourself, even if a memory mentions them.
+
+{storage.render_reminders(scheduled)}"""
+    return mdmem
+
+
+def build_chat_agent() -> Agent[ToolDeps]:
+    """Build the chat agent. Pass the retrieval query as `ToolDeps.query`."""
+    return Agent(
+        model=get_openai_model(),
+        deps_type=ToolDeps,
+        toolsets=[FunctionToolset(tools=[store_memory, create_reminder])],
+        instructions=[
+            f"""# RULES
 When a user sends a new message, decide if the user provided any noteworthy information that should be stored in memory. If so, call the Save Memory tool to store this information in memory.
-Reminders should always go in memory, along with a time.
+When the user asks to be reminded at a specific date and time, or at recurring times, call the Create Reminder tool. Do not also store such a reminder as a memory, it would be sent twice. Reminders without a fixed time (e.g. "when it gets warmer") go in memory instead, along with what should trigger them.
 Anything containing updated information about a memory should be a memory.
 If you notice anything in the conversation history which should be a memory, then also store that in a memory. Notify the user of what you have stored.
 The chat history is reset frequently, so anything long lived should be a memory.
@@ -79,26 +227,32 @@ You can also mark memories which should be forgotten by inserting a memory stati
 
 # Tools
 {tooldescriptions["store"]}
-
-{mdmem}
-{get_time_prompt()}
-    """
-
-    chat_agent = Agent(
-        model=get_openai_model(),
-        instructions=get_chat_instructions(),
-        toolsets=[FunctionToolset(tools=[store_memory])],
+{tooldescriptions["reminder"]}
+""",
+            _chat_memories_instructions,
+            _chat_summary_instructions,
+            get_time_prompt,
+        ],
     )
 
-    return chat_agent
 
-
-async def build_splitter_agent() -> Agent:
-    mdmem = await get_memories_prompt()
-    splitter_agent = Agent(
-        model=get_openai_model(),
-        toolsets=[FunctionToolset(tools=[delete_memory, store_memory, update_memory])],
-        instructions=f"""{cleanerprefix}
+def build_splitter_agent() -> Agent[ToolDeps]:
+    return Agent(
+        model=get_openai_model("maintenance"),
+        deps_type=ToolDeps,
+        toolsets=[
+            FunctionToolset(
+                tools=[
+                    delete_memory,
+                    delete_memories,
+                    store_memory,
+                    store_memories,
+                    update_memory,
+                ]
+            )
+        ],
+        instructions=[
+            f"""{cleanerprefix}
 
 # Tasks
 ## Split overaggregated memories
@@ -110,25 +264,28 @@ Do not include logs about what you changed inside the memory content.
 # Tools
 
 {tooldescriptions["delete"]}
+{tooldescriptions["delete_many"]}
 {tooldescriptions["store"]}
+{tooldescriptions["store_many"]}
 {tooldescriptions["update"]}
-
-{mdmem}
-{get_time_prompt()}
-
-
 """,
+            _maintenance_memories_instructions,
+            get_time_prompt,
+        ],
     )
 
-    return splitter_agent
-
 
-async def build_aggregator_agent() -> Agent:
-    mdmem = await get_memories_prompt()
-    aggregator_agent = Agent(
-        model=get_openai_model(),
-        toolsets=[FunctionToolset(tools=[store_memory, delete_memory])],
-        instructions=f"""{cleanerprefix}
+def build_aggregator_agent() -> Agent[ToolDeps]:
+    return Agent(
+        model=get_openai_model("maintenance"),
+        deps_type=ToolDeps,
+        toolsets=[
+            FunctionToolset(
+                tools=[store_memory, store_memories, delete_memory, delete_memories]
+            )
+        ],
+        instructions=[
+            f"""{cleanerprefix}
 
 ##Aggregate memories
 If there are multiple memories which only make sense when put together, then delete them and add a new memory with the information from all of them.
@@ -143,22 +300,23 @@ Semi long memories are okay, but make sure they do not grow too long.
 
 # Tools
 {tooldescriptions["store"]}
+{tooldescriptions["store_many"]}
 {tooldescriptions["delete"]}
-
-{mdmem}
-{get_time_prompt()}
+{tooldescriptions["delete_many"]}
 """,
+            _maintenance_memories_instructions,
+            get_time_prompt,
+        ],
     )
 
-    return aggregator_agent
 
-
-async def build_deduplicator_agent() -> Agent:
-    mdmem = await get_memories_prompt()
-    dedup_agent = Agent(
-        model=get_openai_model(),
-        toolsets=[FunctionToolset(tools=[delete_memory])],
-        instructions=f"""{cleanerprefix}
+def build_deduplicator_agent() -> Agent[ToolDeps]:
+    return Agent(
+        model=get_openai_model("maintenance"),
+        deps_type=ToolDeps,
+        toolsets=[FunctionToolset(tools=[delete_memory, delete_memories])],
+        instructions=[
+            f"""{cleanerprefix}
 
 ##Deduplicate memories
 If there are duplicate memories, memorizing the same thing, remove some of them and keep the last one.
@@ -168,21 +326,21 @@ If there are memories which contradict each other, then assume the newest one is
 
 # Tools
 {tooldescriptions["delete"]}
-
-{mdmem}
-{get_time_prompt()}
+{tooldescriptions["delete_many"]}
 """,
+            _maintenance_memories_instructions,
+            get_time_prompt,
+        ],
     )
 
-    return dedup_agent
-
 
-async def build_garbage_collector_agent() -> Agent:
-    mdmem = await get_memories_prompt()
-    garbage_collector_agent = Agent(
-        model=get_openai_model(),
-        toolsets=[FunctionToolset(tools=[delete_memory])],
-        instructions=f"""{cleanerprefix}
+def build_garbage_collector_agent() -> Agent[ToolDeps]:
+    return Agent(
+        model=get_openai_model("maintenance"),
+        deps_type=ToolDeps,
+        toolsets=[FunctionToolset(tools=[delete_memory, delete_memories])],
+        instructions=[
+            f"""{cleanerprefix}
 
 # Tasks
 ##Remove old reminders and memories to be deleted
@@ -192,36 +350,39 @@ BE SURE NOT TO REMOVE RECURRING REMINDERS.
 
 # Tools
 {tooldescriptions["delete"]}
-
-{mdmem}
-{get_time_prompt()}
+{tooldescriptions["delete_many"]}
 """,
+            _maintenance_memories_instructions,
+            get_time_prompt,
+        ],
     )
 
-    return garbage_collector_agent
 
-
-async def build_reminder_agent() -> Agent:
+def build_reminder_agent() -> Agent[ToolDeps]:
     """
     Agent that checks memories and sends telegram reminders when time-critical
-    memories are due. Activated periodically (every 15 minutes).
+    memories are due. Activated by the scheduler when scheduled reminders are
+    due, and by the memory scan when reminder memories were stored or changed.
+
+    `ToolDeps.due` lists scheduled reminders which are due now and must be sent.
     """
 
     # Use the refactored send_reminder tool (imported from .tools). The tool
     # handles delivery and persistence of reminder messages.
-    mdmem = await get_memories_prompt()
-
-    reminder_agent = Agent(
+    return Agent(
         model=get_openai_model(),
-        toolsets=[FunctionToolset(tools=[send_reminder, store_memory])],
-        instructions=f"""# RULES
+        deps_type=ToolDeps,
+        toolsets=[
+            FunctionToolset(tools=[send_reminder, store_memory, create_reminder])
+        ],
+        instructions=[
+            f"""# RULES
 You are an agent tasked with sending a user reminders. You are given a list of memories and the current time. If a memory looks like the user should be reminded of it, send the user a reminder with the provided tool. Also record a new memory marking that the reminder has been sent, so that you will not remind the user more than they requested.
 Pay attention to when a memory is relevant. You know the current date and time, only send reminders for memories which are currently relevant and time sensitive.
-For example if a memory says to remind the user of something daily, send a reminder and also record a memory saying that on the current day, the reminder has already been sent.
 If the reminder is a one-time thing, then send the reminder and save a memory saying the reminder can be deleted. Make sure it is clear which reminder the new memory is referring to, include the entire reminder memory if necessary
 
 Do not send any reminders or do anything if no reminders are relevant. 
-You are only activated every 15 minutes, with some unreliability, so anything 20 minutes into the future or into the past is definitely relevant. Relevance might span even further into the future or past if the reminder contains information about its length of relevance
+You are not activated periodically. You run when scheduled reminders are due, which are then listed under Due Reminders, and when memories mentioning reminders were stored or changed. So if a memory asks for a reminder at a specific date and time, or at recurring times, and it is not among the Scheduled Reminders yet, schedule it with the Create Reminder tool rather than waiting to send it yourself. Anything 20 minutes into the future or into the past is relevant now. Relevance might span even further into the future or past if the reminder contains information about its length of relevance
 
 
 # Tools
@@ -231,9 +392,108 @@ Use this tool to store information about the user and reminders. Use this to sto
 ## Send Reminder
 Use this tool to send a reminder. Be very liberal with this. If something looks like it could be relevant, it probably is.
 
-{mdmem}
-{get_time_prompt()}
+{tooldescriptions["reminder"]}
 """,
+            _reminder_memories_instructions,
+            get_time_prompt,
+        ],
+    )
+
+
+def build_summarizer_agent() -> Agent[ToolDeps]:
+    """Agent folding old chat turns into the rolling history summary."""
+    return Agent(
+        model=get_openai_model("maintenance"),
+        deps_type=ToolDeps,
+        instructions="""# RULES
+You maintain a running summary of a conversation between a user and their personal organizer assistant. You are given the summary so far and the turns that happened after it.
+Return an updated summary that keeps what is still useful for continuing the conversation: open questions, commitments, plans and the topics discussed, with dates where they matter.
+Drop small talk and details that no longer matter. Facts stored as memories do not need to be repeated in full. Keep the summary short, at most a few paragraphs.
+Reply with the summary only.""",
     )
 
-    return reminder_agent
+
+# name -> builder of every agent; maintenance agents use the names of
+# zeno.maintenance.MAINTENANCE_TASKS.
+AGENT_BUILDERS: dict[str, Callable[[], Agent[ToolDeps]]] = {
+    "chat": build_chat_agent,
+    "reminder": build_reminder_agent,
+    "deduplicator": build_deduplicator_agent,
+    "aggregator": build_aggregator_agent,
+    "splitter": build_splitter_agent,
+    "garbage_collector": build_garbage_collector_agent,
+    "summarizer": build_summarizer_agent,
+}
+
+_agents: dict[str, Agent[ToolDeps]] = {}
+
+
+def get_agent(name: str) -> Agent[ToolDeps]:
+    """Return the agent `name`, building it on first use.
+
+    Agents are long-lived: their memories and the current time are rendered
+    by instruction functions from the run's ToolDeps before each model
+    request, so nothing is rebuilt per message.
+    """
+    agent = _agents.get(name)
+    if agent is None:
+        agent = _agents[name] = AGENT_BUILDERS[name]()
+    return agent
+
+
+def _writes(name: str, deps: ToolDeps) -> contextlib.AbstractAsyncContextManager:
+    """Return the context the tool writes of a run of agent `name` apply in."""
+    if name in UNBUFFERED_AGENTS:
+        return contextlib.nullcontext()
+    return unit_of_work(deps)
+
+
+async def run_agent(
+    name: str, prompt: str, deps: ToolDeps | None = None, **kwargs: Any
+) -> AgentRunResult[str]:
+    """Run the agent `name` with its memory writes in one unit of work.
+
+    The writes are committed in a single transaction when the run finishes
+    and discarded if it fails, except for UNBUFFERED_AGENTS. `kwargs` are
+    passed on to Agent.run().
+    """
+    deps = deps if deps is not None else ToolDeps()
+    async with _writes(name, deps):
+        return await get_agent(name).run(prompt, deps=deps, **kwargs)
+
+
+async def stream_agent(
+    name: str,
+    prompt: str,
+    on_text: Callable[[str], Awaitable[None]],
+    deps: ToolDeps | None = None,
+    **kwargs: Any,
+) -> AgentRunResult[str]:
+    """Like run_agent(), but stream the text of each model response.
+
+    `on_text` is called with the text of the current response so far as
+    tokens arrive; a response following tool calls starts over from the
+    beginning. The returned result is the same as run_agent()'s.
+    """
+    deps = deps if deps is not None else ToolDeps()
+    agent = get_agent(name)
+    async with _writes(name, deps):
+        async with agent.iter(prompt, deps=deps, **kwargs) as run:
+            async for node in run:
+                if Agent.is_model_request_node(node):
+                    async with node.stream(run.ctx) as stream:
+                        async for text in stream.stream_text(debounce_by=None):
+                            await on_text(text)
+        assert run.result is not None
+        return run.result
+
+
+def build_agents() -> None:
+    """Build every agent up front, e.g. at startup."""
+    for name in AGENT_BUILDERS:
+        get_agent(name)
+
+
+def reset_agents() -> None:
+    """Forget the built agents so the next get_agent() rebuilds them."""
+    _agents.clear()
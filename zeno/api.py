@@ -1,23 +1,38 @@
 import asyncio
+import base64
+import binascii
+import hashlib
+import json
 import uuid
 import logging
-from typing import Any, Dict, Callable, Awaitable
-
-from fastapi import FastAPI, Query
-from fastapi.responses import PlainTextResponse, JSONResponse, Response
-
-from . import storage
-from .agents import (
-    build_deduplicator_agent,
-    build_aggregator_agent,
-    build_splitter_agent,
-    build_garbage_collector_agent,
-    build_reminder_agent,
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Callable, Awaitable, Literal, cast
+
+from fastapi import FastAPI, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import (
+    PlainTextResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
 )
+from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
+
+from . import runtime, storage
+from .models import Memory, MessageArchive
+from .schemas import MemoryRead, MessageArchiveRead
+from .agents import run_agent
+from .maintenance import run_maintenance_task
 
 app = FastAPI()
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 logger = logging.getLogger("zeno.api")
 
+# The memory version restarts at 0 with the process, so ETags derived from it
+# also carry an id of this process.
+_BOOT_ID = uuid.uuid4().hex[:12]
+
 # Simple in-memory task registry (task_id -> asyncio.Task) and results mapping
 # Note: Using in-memory storage is acceptable here because:
 # 1. Tasks are short-lived AI agent operations (not long-running jobs)
@@ -28,26 +43,30 @@ _tasks: Dict[str, asyncio.Task] = {}
 _results: Dict[str, Dict[str, Any]] = {}
 
 
-async def _run_agent_and_store(
-    tid: str, builder: Callable[[], Awaitable[Any]], run_arg: str
+async def _run_agent(name: str, run_arg: str) -> Any:
+    res = await run_agent(name, run_arg)
+    return getattr(res, "output", None)
+
+
+async def _run_job_and_store(
+    tid: str, job: Callable[[], Awaitable[Any]], description: str
 ) -> None:
-    """Build and run an agent, storing its result into _results under tid.
+    """Run a job, storing its output into _results under tid.
 
     This isolates the background execution logic so endpoints can reuse it.
     """
     try:
-        agent = await builder()
-        res = await agent.run(run_arg)
-        _results[tid] = {"status": "done", "output": getattr(res, "output", None)}
+        output = await job()
+        _results[tid] = {"status": "done", "output": output}
     except Exception as exc:  # pragma: no cover - keep task from crashing silently
-        logger.exception("Agent task failed: %s", run_arg)
+        logger.exception("Agent task failed: %s", description)
         _results[tid] = {"status": "error", "error": str(exc)}
 
 
-async def _handle_agent_request(
-    builder: Callable[[], Awaitable[Any]], run_arg: str, wait: bool
+async def _handle_job_request(
+    job: Callable[[], Awaitable[Any]], description: str, wait: bool
 ) -> JSONResponse:
-    """Common handler to either run an agent synchronously (wait=True) or spawn
+    """Common handler to either run a job synchronously (wait=True) or spawn
     a background task and return a task id.
 
     The endpoint is responsible for HTTP concerns only; this helper centralizes
@@ -55,15 +74,13 @@ async def _handle_agent_request(
     """
     if wait:
         try:
-            agent = await builder()
-            res = await agent.run(run_arg)
-            return JSONResponse({"output": getattr(res, "output", None)})
+            return JSONResponse({"output": await job()})
         except Exception as exc:
-            logger.exception("Agent run failed (sync): %s", run_arg)
+            logger.exception("Agent run failed (sync): %s", description)
             return JSONResponse({"error": str(exc)}, status_code=500)
 
     task_id = uuid.uuid4().hex
-    task = asyncio.create_task(_run_agent_and_store(task_id, builder, run_arg))
+    task = asyncio.create_task(_run_job_and_store(task_id, job, description))
     _tasks[task_id] = task
 
     def _on_done(t: asyncio.Task, tid=task_id) -> None:
@@ -73,6 +90,20 @@ async def _handle_agent_request(
     return JSONResponse({"task_id": task_id}, status_code=202)
 
 
+async def _handle_agent_request(name: str, run_arg: str, wait: bool) -> JSONResponse:
+    """Run the agent `name` with `run_arg` as a job."""
+    return await _handle_job_request(lambda: _run_agent(name, run_arg), run_arg, wait)
+
+
+async def _handle_sharded_request(name: str, wait: bool) -> JSONResponse:
+    """Run the maintenance task `name` in sharded mode as a job."""
+    return await _handle_job_request(
+        lambda: run_maintenance_task(name, mode="sharded"),
+        f"Sharded {name} run",
+        wait,
+    )
+
+
 @app.get("/memories")
 async def get_memories(show_id: int = Query(0, ge=0)) -> Response:
     """Return stored memories as plain text.
@@ -90,27 +121,127 @@ async def get_memories(show_id: int = Query(0, ge=0)) -> Response:
     return PlainTextResponse(output, media_type="text/plain; charset=utf-8")
 
 
-@app.post("/deduplicate")
-async def deduplicate(wait: bool = Query(False)) -> JSONResponse:
-    """Start a deduplication run."""
-    return await _handle_agent_request(
-        build_deduplicator_agent, "Deduplicate memories", wait
+def _memories_etag(version: int, *params: Any) -> str:
+    key = "|".join(map(str, (_BOOT_ID, version, *params)))
+    return f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+
+def _etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if if_none_match is None:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@app.get("/api/memories")
+async def list_memories(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = Query(None),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    min_relevance: float | None = Query(None, ge=0.0, le=1.0),
+    if_none_match: str | None = Header(None),
+) -> Response:
+    """Return a page of memories as MemoryRead objects, oldest first.
+
+    `since`/`until` bound the creation time (naive Europe/Berlin time,
+    `until` exclusive) and `min_relevance` the relevance. The next page is
+    fetched with the returned `next_cursor`, which is null on the last page.
+
+    The ETag changes whenever the memory table does, so clients that send
+    it back in If-None-Match get a 304 without the database being queried.
+    """
+    after = None
+    if cursor is not None:
+        try:
+            after = _decode_cursor(cursor)
+        except ValueError:
+            return JSONResponse({"error": "invalid cursor"}, status_code=400)
+
+    # Read the version before querying, like storage.get_memories(): a write
+    # committed while the query runs then changes the ETag of the next
+    # request instead of being hidden behind this one.
+    version = storage.get_memory_version()
+    etag = _memories_etag(version, limit, cursor, since, until, min_relevance)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        memories = await storage.list_memories(
+            limit + 1, after, since, until, min_relevance
+        )
+    except Exception as exc:  # pragma: no cover - surface runtime errors
+        logger.exception("Failed to list memories")
+        return JSONResponse(
+            {"error": "failed to list memories", "detail": str(exc)}, status_code=500
+        )
+
+    page = memories[:limit]
+    next_cursor = _encode_cursor(page[-1]) if len(memories) > limit else None
+    return JSONResponse(
+        {
+            "memories": [
+                MemoryRead.model_validate(m).model_dump(mode="json") for m in page
+            ],
+            "next_cursor": next_cursor,
+        },
+        headers=headers,
     )
 
 
-@app.post("/aggregate")
-async def aggregate(wait: bool = Query(False)) -> JSONResponse:
-    """Run the memory aggregator agent (merge related memories)."""
-    return await _handle_agent_request(
-        build_aggregator_agent, "Aggregate memories", wait
+@app.get("/memories/search")
+async def search_memories(
+    q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100)
+) -> JSONResponse:
+    """Full-text search over memories, best match (BM25) first."""
+    try:
+        memories = await storage.search_memories(q, limit)
+    except Exception as exc:  # pragma: no cover - surface runtime errors
+        logger.exception("Failed to search memories")
+        return JSONResponse(
+            {"error": "failed to search memories", "detail": str(exc)},
+            status_code=500,
+        )
+
+    return JSONResponse(
+        [MemoryRead.model_validate(m).model_dump(mode="json") for m in memories]
     )
 
 
+@app.post("/deduplicate")
+async def deduplicate(
+    wait: bool = Query(False), sharded: bool = Query(False)
+) -> JSONResponse:
+    """Start a deduplication run.
+
+    With sharded=true the memories are split into shards processed by
+    concurrent agent runs.
+    """
+    if sharded:
+        return await _handle_sharded_request("deduplicator", wait)
+    return await _handle_agent_request("deduplicator", "Deduplicate memories", wait)
+
+
+@app.post("/aggregate")
+async def aggregate(
+    wait: bool = Query(False), sharded: bool = Query(False)
+) -> JSONResponse:
+    """Run the memory aggregator agent (merge related memories).
+
+    With sharded=true the memories are split into shards processed by
+    concurrent agent runs.
+    """
+    if sharded:
+        return await _handle_sharded_request("aggregator", wait)
+    return await _handle_agent_request("aggregator", "Aggregate memories", wait)
+
+
 @app.post("/split")
 async def split(wait: bool = Query(False)) -> JSONResponse:
     """Run the splitter agent to split over-aggregated memories."""
     return await _handle_agent_request(
-        build_splitter_agent, "Split overaggregated memories", wait
+        "splitter", "Split overaggregated memories", wait
     )
 
 
@@ -118,7 +249,7 @@ async def split(wait: bool = Query(False)) -> JSONResponse:
 async def garbage_collect(wait: bool = Query(False)) -> JSONResponse:
     """Run the garbage collector agent to remove old/unneeded memories."""
     return await _handle_agent_request(
-        build_garbage_collector_agent, "Garbage collect old/unneeded memories", wait
+        "garbage_collector", "Garbage collect old/unneeded memories", wait
     )
 
 
@@ -129,8 +260,20 @@ async def reminders(wait: bool = Query(False)) -> JSONResponse:
     Note: reminder agent's work may send messages via Telegram; running it
     synchronously (wait=True) will block until delivery attempts complete.
     """
-    return await _handle_agent_request(
-        build_reminder_agent, "Check for due reminders", wait
+    return await _handle_agent_request("reminder", "Check for due reminders", wait)
+
+
+@app.get("/health")
+async def health() -> JSONResponse:
+    """Report the state of the bot, API and periodic loop tasks.
+
+    Returns 503 if any of them has stopped or failed.
+    """
+    tasks = runtime.get_health()
+    healthy = all(t["state"] == "running" for t in tasks.values())
+    return JSONResponse(
+        jsonable_encoder({"healthy": healthy, "tasks": tasks}),
+        status_code=200 if healthy else 503,
     )
 
 
@@ -153,35 +296,137 @@ async def get_task_status(task_id: str) -> JSONResponse:
     return JSONResponse({"status": "running"})
 
 
-@app.get("/old_messages")
-async def old_messages(limit: int = Query(20, ge=1)) -> Response:
-    """Return the last `limit` messages as Markdown."""
+def _encode_cursor(row: MessageArchive | Memory) -> str:
+    """Return an opaque cursor for the keyset position of `row`."""
+    raw = f"{row.created_time.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Return the (created_time, id) keyset position of `cursor`.
+
+    Raises ValueError for malformed cursors.
+    """
     try:
-        msgs = await storage.get_old_messages(limit)
-    except Exception as exc:  # pragma: no cover - surface runtime errors
-        logger.exception("Failed to get old messages")
-        return JSONResponse(
-            {"error": "failed to get old messages", "detail": str(exc)}, status_code=500
-        )
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError(str(exc)) from exc
+    created_time, _, id = raw.partition("|")
+    return datetime.fromisoformat(created_time), int(id)
+
+
+def _render_message(i: int, m: ModelMessage) -> str:
+    parts: list[str] = [f"## Message {i}\n"]
+    parts.append(f"**Parts:** {', '.join(type(p).__name__ for p in m.parts)}\n\n")
+
+    for j, p in enumerate(m.parts, 1):
+        parts.append(f"### Part {j}: {type(p).__name__}\n")
+        content = getattr(p, "content", None)
+        if content is not None:
+            if isinstance(content, (bytes, bytearray)):
+                try:
+                    content = content.decode()
+                except Exception:
+                    content = str(content)
+            parts.append(f"{content}\n\n")
+        else:
+            parts.append(f"{str(p)}\n\n")
+    parts.append("---\n")
+    return "".join(parts)
+
+
+async def _chronological(
+    archives: AsyncIterator[MessageArchive],
+) -> AsyncIterator[MessageArchive]:
+    """Yield a page of newest-first `archives` oldest first.
+
+    The page has to be read completely before its first archive is known.
+    """
+    page = [archive async for archive in archives]
+    for archive in reversed(page):
+        yield archive
+
+
+def _next_cursor(oldest: MessageArchive | None, count: int, limit: int) -> str | None:
+    """Return the cursor of the page after one ending at `oldest`, if any."""
+    return _encode_cursor(oldest) if oldest is not None and count == limit else None
+
+
+def _older(a: MessageArchive, b: MessageArchive | None) -> MessageArchive:
+    if b is None or (a.created_time, a.id) < (b.created_time, b.id):
+        return a
+    return b
+
+
+async def _old_messages_markdown(
+    archives: AsyncIterator[MessageArchive], limit: int, newest_first: bool
+) -> AsyncIterator[str]:
+    yield "# Old Messages\n\n"
+    i = count = 0
+    oldest: MessageArchive | None = None
+    async for archive in archives:
+        if newest_first:
+            # messages run oldest first within an archive, so show where the
+            # archives start
+            yield f"# Archive {archive.id} ({archive.created_time:%Y-%m-%d %H:%M})\n\n"
+        for m in ModelMessagesTypeAdapter.validate_json(cast(str, archive.content)):
+            i += 1
+            yield _render_message(i, m)
+        count += 1
+        oldest = _older(archive, oldest)
+    next_cursor = _next_cursor(oldest, count, limit)
+    if next_cursor is not None:
+        yield f"\nNext page: `/old_messages?cursor={next_cursor}`\n"
+
+
+async def _old_messages_json(
+    archives: AsyncIterator[MessageArchive], limit: int
+) -> AsyncIterator[str]:
+    yield '{"archives": ['
+    count = 0
+    oldest: MessageArchive | None = None
+    async for archive in archives:
+        if count:
+            yield ","
+        yield MessageArchiveRead.model_validate(archive).model_dump_json()
+        count += 1
+        oldest = _older(archive, oldest)
+    next_cursor = _next_cursor(oldest, count, limit)
+    yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
 
-    parts: list[str] = ["# Old Messages\n\n"]
-    for i, m in enumerate(msgs, 1):
-        parts.append(f"## Message {i}\n")
-        parts.append(f"**Parts:** {', '.join(type(p).__name__ for p in m.parts)}\n\n")
-
-        for j, p in enumerate(m.parts, 1):
-            parts.append(f"### Part {j}: {type(p).__name__}\n")
-            content = getattr(p, "content", None)
-            if content is not None:
-                if isinstance(content, (bytes, bytearray)):
-                    try:
-                        content = content.decode()
-                    except Exception:
-                        content = str(content)
-                parts.append(f"{content}\n\n")
-            else:
-                parts.append(f"{str(p)}\n\n")
-        parts.append("---\n")
-
-    md = "".join(parts)
-    return Response(md, media_type="text/markdown; charset=utf-8")
+
+@app.get("/old_messages")
+async def old_messages(
+    limit: int = Query(20, ge=1),
+    cursor: str | None = Query(None),
+    format: Literal["markdown", "json"] = Query("markdown"),
+    newest_first: bool = Query(False),
+) -> Response:
+    """Page back through the message archives.
+
+    Returns the latest `limit` archives older than `cursor` (the cursor of the
+    previous page), in chronological order or, with newest_first=true, newest
+    first. They are rendered as Markdown or, with format=json, as
+    MessageArchiveRead objects. The archives are read in batches and, newest
+    first, streamed as they are read, so large pages don't need to fit into
+    memory. The cursor of the next page is given at the end of the response
+    and is absent on the last page.
+    """
+    before = None
+    if cursor is not None:
+        try:
+            before = _decode_cursor(cursor)
+        except ValueError:
+            return JSONResponse({"error": "invalid cursor"}, status_code=400)
+
+    archives = storage.iter_message_archives(limit, before)
+    if not newest_first:
+        archives = _chronological(archives)
+    if format == "json":
+        return StreamingResponse(
+            _old_messages_json(archives, limit), media_type="application/json"
+        )
+    return StreamingResponse(
+        _old_messages_markdown(archives, limit, newest_first),
+        media_type="text/markdown; charset=utf-8",
+    )
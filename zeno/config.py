@@ -9,3 +9,72 @@ except (KeyError, TypeError, ValueError) as e:
         "TELEGRAM_CHAT_ID environment variable must be set to a valid integer. "
         "This is required for bot security and cannot have a default value."
     ) from e
+
+# Maintenance agents run in "full" mode (every memory is sent to the LLM), in
+# "delta" mode (only memories changed since the agent's last successful run,
+# plus a few related memories as context) or in "sharded" mode (concurrent
+# runs over shards of MAINTENANCE_SHARD_SIZE memories). Delta runs still fall
+# back to a full pass every MAINTENANCE_FULL_HOURS so time based clean-up keeps
+# working.
+MAINTENANCE_MODE = os.environ.get("MAINTENANCE_MODE", "full")
+MAINTENANCE_FULL_HOURS = int(os.environ.get("MAINTENANCE_FULL_HOURS", "72"))
+MAINTENANCE_RELATED = int(os.environ.get("MAINTENANCE_RELATED", "3"))
+MAINTENANCE_SHARD_SIZE = int(os.environ.get("MAINTENANCE_SHARD_SIZE", "200"))
+MAINTENANCE_CONCURRENCY = int(os.environ.get("MAINTENANCE_CONCURRENCY", "4"))
+# "time" (creation time windows) or "similarity" (shared words)
+MAINTENANCE_SHARDING = os.environ.get("MAINTENANCE_SHARDING", "time")
+# "minhash" shows full deduplicator runs only the clusters of near-duplicate
+# memories found locally, except for one unfiltered run every
+# MAINTENANCE_FULL_HOURS that also catches contradictions; "none" sends every
+# memory.
+DEDUP_PREFILTER = os.environ.get("DEDUP_PREFILTER", "minhash")
+
+# The chat agent either sees every memory ("all") or only the CHAT_MEMORY_TOP_K
+# memories most relevant to the conversation plus pinned reminder memories
+# ("retrieval"). In both modes the memories are capped at roughly
+# CHAT_MEMORY_TOKEN_BUDGET tokens, of which pinned reminder memories may use at
+# most CHAT_PINNED_TOKEN_BUDGET so they can't crowd out everything else.
+CHAT_MEMORY_MODE = os.environ.get("CHAT_MEMORY_MODE", "retrieval")
+CHAT_MEMORY_TOP_K = int(os.environ.get("CHAT_MEMORY_TOP_K", "30"))
+CHAT_MEMORY_TOKEN_BUDGET = int(os.environ.get("CHAT_MEMORY_TOKEN_BUDGET", "3000"))
+CHAT_PINNED_TOKEN_BUDGET = int(os.environ.get("CHAT_PINNED_TOKEN_BUDGET", "1000"))
+# Memory relevance is recomputed before every maintenance cycle: it halves
+# every RELEVANCE_HALF_LIFE_DAYS since a memory was created or last retrieved,
+# is raised by retrieval hits (saturating at RELEVANCE_ACCESS_SATURATION hits)
+# and stays at 1.0 for reminder memories. Memories below MEMORY_MIN_RELEVANCE
+# are left out of the chat and reminder prompts (maintenance agents always
+# see every memory).
+RELEVANCE_HALF_LIFE_DAYS = float(os.environ.get("RELEVANCE_HALF_LIFE_DAYS", "90"))
+RELEVANCE_ACCESS_SATURATION = int(os.environ.get("RELEVANCE_ACCESS_SATURATION", "10"))
+MEMORY_MIN_RELEVANCE = float(os.environ.get("MEMORY_MIN_RELEVANCE", "0.0"))
+# The chat history holds the newest turns fitting CHAT_HISTORY_TOKEN_BUDGET
+# tokens; older turns are folded into a rolling summary by the summarizer agent
+# once they add up to half the budget, and stay in the history until then.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "4000"))
+
+# Messages sent in quick succession are answered by one chat agent run: the
+# run starts once the chat has been quiet for CHAT_DEBOUNCE_SECONDS, and
+# messages arriving while it runs are answered together afterwards.
+CHAT_DEBOUNCE_SECONDS = float(os.environ.get("CHAT_DEBOUNCE_SECONDS", "2.0"))
+# With CHAT_STREAMING the chat reply is shown while it is generated: a
+# placeholder message is sent right away and edited as tokens arrive, at most
+# once per CHAT_STREAM_EDIT_INTERVAL seconds to stay within Telegram's rate
+# limits for edits.
+CHAT_STREAMING = os.environ.get("CHAT_STREAMING", "1") == "1"
+CHAT_STREAM_EDIT_INTERVAL = float(os.environ.get("CHAT_STREAM_EDIT_INTERVAL", "1.0"))
+
+# Due reminders are sent as they are ("direct") or phrased by the reminder
+# agent ("agent"). Reminders that only exist as memories are found by a
+# reminder agent scan, which checks every 15 minutes but only calls the LLM
+# when a memory mentioning reminders was stored or updated since the last scan
+# (a cheap query of the memory change log). REMINDER_MEMORY_SCAN runs the scan
+# on every tick regardless, as before reminders had their own table.
+REMINDER_DELIVERY = os.environ.get("REMINDER_DELIVERY", "direct")
+REMINDER_MEMORY_SCAN = os.environ.get("REMINDER_MEMORY_SCAN", "0") == "1"
+
+# Message archives older than ARCHIVE_COMPRESS_DAYS are moved, zlib
+# compressed, to the cold archive table. With ARCHIVE_RETENTION_DAYS set, cold
+# archives older than that are deleted for good, but only once the chat
+# history summary covers them; the default 0 keeps them forever.
+ARCHIVE_COMPRESS_DAYS = int(os.environ.get("ARCHIVE_COMPRESS_DAYS", "7"))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "0"))
@@ -1,11 +1,85 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 import os
 
 # Centralized database URL. Can be overridden via `DATABASE_URL` env var.
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite+aiosqlite:///./data/zeno.db")
 
-async_engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+# PRAGMAs applied to every new SQLite connection, selected by SQLITE_PROFILE.
+# "production" switches to WAL so readers never block the writer (and vice
+# versa), syncs less often (still safe against application crashes in WAL
+# mode), waits for locks instead of failing right away and gives SQLite more
+# page cache and memory-mapped I/O. "default" keeps SQLite's defaults.
+SQLITE_PROFILES: dict[str, dict[str, str | int]] = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # negative values are KiB
+        "cache_size": -int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536")),
+    },
+    "default": {},
+}
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "production")
+# Connections of the read-only engine.
+SQLITE_READERS = int(os.environ.get("SQLITE_READERS", "4"))
+
+_is_sqlite_file = DATABASE_URL.startswith("sqlite") and ":memory:" not in DATABASE_URL
+
+
+def _set_pragmas(engine: AsyncEngine, pragmas: dict[str, str | int]) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+if _is_sqlite_file:
+    pragmas = SQLITE_PROFILES[SQLITE_PROFILE]
+    # SQLite allows a single writer at a time, so writes share one connection
+    # and queue in the pool instead of contending for the database lock.
+    async_engine = create_async_engine(
+        DATABASE_URL, echo=False, future=True, pool_size=1, max_overflow=0
+    )
+    _set_pragmas(async_engine, pragmas)
+    # Readers get their own pool of query-only connections; in WAL mode they
+    # read a consistent snapshot while the writer commits.
+    read_engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        future=True,
+        pool_size=SQLITE_READERS,
+        max_overflow=0,
+    )
+    _set_pragmas(
+        read_engine,
+        {k: v for k, v in pragmas.items() if k != "journal_mode"} | {"query_only": 1},
+    )
+else:
+    async_engine = read_engine = create_async_engine(
+        DATABASE_URL, echo=False, future=True
+    )
+
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine, class_=AsyncSession, expire_on_commit=False
 )
+# Sessions for queries that never write; see read_engine.
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+async def dispose_engines() -> None:
+    """Close all pooled connections of the writer and reader engines."""
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
@@ -0,0 +1,134 @@
+"""Token-budgeted chat history with a rolling summary of older turns.
+
+The chat agent gets the newest message archives that fit into
+CHAT_HISTORY_TOKEN_BUDGET (estimated locally, no tokenizer round trip) instead
+of a fixed number of archives. Archives are kept whole so tool calls stay
+paired with their results. Turns that fall out of the window are folded into
+a rolling summary by the summarizer agent after the reply has been sent, in
+batches of half the budget, so the prompt size stays predictable without
+losing older context or calling the summarizer after every reply.
+"""
+
+import asyncio
+import logging
+from typing import Sequence, cast
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+
+from . import storage
+from .agents import run_agent
+from .config import CHAT_HISTORY_TOKEN_BUDGET
+from .models import HistorySummary
+from .storage import HistoryEntry
+
+logger = logging.getLogger("zeno.history")
+
+_summary_lock = asyncio.Lock()
+_background: set[asyncio.Task] = set()
+
+
+def split_window(
+    entries: Sequence[HistoryEntry], budget: int
+) -> tuple[list[HistoryEntry], list[HistoryEntry]]:
+    """Split `entries` (oldest first) into (overflow, window).
+
+    The window holds the newest entries whose tokens add up to at most
+    `budget`, but always at least the newest entry; everything older is
+    overflow.
+    """
+    used = 0
+    start = len(entries)
+    while start > 0 and (
+        start == len(entries) or used + entries[start - 1].tokens <= budget
+    ):
+        start -= 1
+        used += entries[start].tokens
+    return list(entries[:start]), list(entries[start:])
+
+
+def split_unsummarized(
+    entries: Sequence[HistoryEntry], budget: int, summary: HistorySummary | None
+) -> tuple[list[HistoryEntry], list[HistoryEntry]]:
+    """Split `entries` into (turns to summarize, window).
+
+    Turns leaving the window are only summarized in batches of at least half
+    the `budget` tokens, so not every reply costs a summarizer call; until
+    then they stay in the window.
+    """
+    overflow, window = split_window(entries, budget)
+    if summary is not None:
+        overflow = [e for e in overflow if e.archive_id > summary.last_archive_id]
+    if sum(e.tokens for e in overflow) < budget // 2:
+        return [], overflow + window
+    return overflow, window
+
+
+async def get_chat_history(
+    budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+) -> tuple[list[ModelMessage], str | None]:
+    """Return the messages in the history window and the rolling summary."""
+    summary = await storage.get_history_summary()
+    _, window = split_unsummarized(await storage.get_history_entries(), budget, summary)
+    messages = [msg for entry in window for msg in entry.messages]
+    return messages, cast(str, summary.content) if summary is not None else None
+
+
+def render_turns(entries: Sequence[HistoryEntry]) -> str:
+    """Render the user prompts, replies and tool calls of `entries` as text."""
+    lines = []
+    for entry in entries:
+        for message in entry.messages:
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    lines.append(f"User: {part.content}")
+                elif isinstance(part, TextPart):
+                    lines.append(f"Assistant: {part.content}")
+                elif isinstance(part, ToolCallPart):
+                    lines.append(
+                        f"Tool call: {part.tool_name}({part.args_as_json_str()})"
+                    )
+    return "\n".join(lines)
+
+
+async def summarize_overflow(budget: int = CHAT_HISTORY_TOKEN_BUDGET) -> bool:
+    """Fold turns that left the history window into the rolling summary.
+
+    Returns False without calling the LLM until enough new turns left the
+    window (see split_unsummarized).
+    """
+    async with _summary_lock:
+        summary = await storage.get_history_summary()
+        overflow, _ = split_unsummarized(
+            await storage.get_history_entries(), budget, summary
+        )
+        if not overflow:
+            return False
+
+        prompt = (
+            f"# Summary so far\n{summary.content if summary else '(none)'}\n\n"
+            f"# New turns\n{render_turns(overflow)}"
+        )
+        res = await run_agent("summarizer", prompt)
+        await storage.set_history_summary(res.output, overflow[-1].archive_id)
+        logger.info("Folded %d archives into the history summary", len(overflow))
+        return True
+
+
+async def _summarize_in_background() -> None:
+    try:
+        await summarize_overflow()
+    except Exception:
+        logger.exception("Updating the history summary failed")
+
+
+def schedule_summary() -> None:
+    """Update the rolling summary without delaying the caller."""
+    task = asyncio.create_task(_summarize_in_background())
+    # keep a reference so the task isn't garbage collected while running
+    _background.add(task)
+    task.add_done_callback(_background.discard)
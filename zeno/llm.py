@@ -0,0 +1,74 @@
+"""Process-wide registry of the OpenAI models used by the agents.
+
+Configuration is read once and every model shares one pooled httpx client, so
+agent builds no longer re-read `.env` or open new connections. Chat and
+maintenance may use different models: MAINTENANCE_MODEL_NAME defaults to
+MODEL_NAME.
+"""
+
+import os
+
+import dotenv
+import httpx
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+# Model roles and the environment variables naming their model, in order of
+# preference.
+ROLES = {
+    "chat": ("MODEL_NAME",),
+    "maintenance": ("MAINTENANCE_MODEL_NAME", "MODEL_NAME"),
+}
+
+_http_client: httpx.AsyncClient | None = None
+_provider: OpenAIProvider | None = None
+_models: dict[str, OpenAIModel] = {}
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            # HTTP/2 multiplexes concurrent requests over one connection
+            http2=True,
+            limits=httpx.Limits(max_connections=20, keepalive_expiry=120),
+            # matches the OpenAI client's defaults
+            timeout=httpx.Timeout(600, connect=5),
+        )
+    return _http_client
+
+
+def _get_provider() -> OpenAIProvider:
+    global _provider
+    if _provider is None:
+        # Load environment when the model is first needed to avoid
+        # import-time side-effects.
+        dotenv.load_dotenv()
+        _provider = OpenAIProvider(
+            api_key=os.environ["OPENAI_API_KEY"],
+            base_url=os.environ["OPENAI_BASE_URL"],
+            http_client=_get_http_client(),
+        )
+    return _provider
+
+
+def get_model(role: str = "chat") -> OpenAIModel:
+    """Return the shared model for `role` ("chat" or "maintenance")."""
+    model = _models.get(role)
+    if model is None:
+        provider = _get_provider()  # loads .env
+        *preferred, required = ROLES[role]
+        name = next((os.environ[v] for v in preferred if os.environ.get(v)), None)
+        model = _models[role] = OpenAIModel(
+            name or os.environ[required], provider=provider
+        )
+    return model
+
+
+async def close_models() -> None:
+    """Close the shared HTTP client and forget all models."""
+    global _http_client, _provider
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = _provider = None
+    _models.clear()
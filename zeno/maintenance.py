@@ -0,0 +1,248 @@
+"""Orchestration of the memory maintenance agents.
+
+Each maintenance agent can run in one of three modes:
+
+- full: the agent is prompted with every stored memory.
+- delta: the agent is prompted only with the memories changed since its last
+  successful run (according to the memory change log) plus the most related
+  unchanged memories. Runs with no new changes skip the LLM entirely.
+- sharded: the memories are partitioned into shards which are processed by
+  concurrent agent runs, followed by a delta run over the edits the shards
+  made to reconcile changes across shard boundaries.
+
+Full deduplicator runs only show the LLM groups of near-duplicate memories
+found locally with MinHash/LSH (see zeno.minhash) when DEDUP_PREFILTER is
+"minhash". Contradictions are not near-duplicates, though, so an unfiltered
+run that sees every memory still happens at least every
+MAINTENANCE_FULL_HOURS.
+
+A delta run falls back to a full run when the agent has never run before or
+its last full run is older than MAINTENANCE_FULL_HOURS, because some clean-up
+(e.g. removing reminders from the past) depends on time rather than on edits.
+A full run whose memories would exceed MAINTENANCE_TOKEN_BUDGET runs sharded
+instead, so every memory is still looked at.
+"""
+
+import asyncio
+import logging
+import zlib
+from datetime import timedelta
+from typing import Any, Sequence, cast
+
+from . import storage
+from .agents import run_agent
+from .config import (
+    DEDUP_PREFILTER,
+    MAINTENANCE_CONCURRENCY,
+    MAINTENANCE_FULL_HOURS,
+    MAINTENANCE_RELATED,
+    MAINTENANCE_SHARD_SIZE,
+    MAINTENANCE_SHARDING,
+)
+from .minhash import candidate_clusters
+from .models import Memory
+from .tools import ToolDeps
+from .utils import get_current_naive_time
+
+logger = logging.getLogger("zeno.maintenance")
+
+# agent name -> run prompt, in the order of a maintenance cycle
+MAINTENANCE_TASKS: dict[str, str] = {
+    "deduplicator": "Deduplicate memories",
+    "aggregator": "Aggregate memories",
+    "splitter": "Split overaggregated memories",
+    "garbage_collector": "Garbage collect old/unneeded memories",
+}
+
+# Estimated tokens of memories a single run may be prompted with; larger full
+# runs are sharded.
+MAINTENANCE_TOKEN_BUDGET = 60_000
+
+
+def partition_by_time(
+    memories: Sequence[Memory], shard_size: int
+) -> list[list[Memory]]:
+    """Split `memories` into consecutive windows of creation time."""
+    ordered = sorted(memories, key=lambda m: m.created_time)
+    return [ordered[i : i + shard_size] for i in range(0, len(ordered), shard_size)]
+
+
+def _similarity_key(memory: Memory) -> tuple[int, ...]:
+    # Smallest word hash under a few salts (a tiny MinHash signature): memories
+    # sharing words tend to share keys and therefore sort next to each other.
+    words = storage.words(cast(str, memory.content)) or {""}
+    return tuple(
+        min(zlib.crc32(f"{salt}:{w}".encode()) for w in words) for salt in range(3)
+    )
+
+
+def partition_by_similarity(
+    memories: Sequence[Memory], shard_size: int
+) -> list[list[Memory]]:
+    """Split `memories` into shards of similar content."""
+    ordered = sorted(memories, key=_similarity_key)
+    return [ordered[i : i + shard_size] for i in range(0, len(ordered), shard_size)]
+
+
+async def _duplicate_candidates() -> ToolDeps | None:
+    """Render the near-duplicate clusters found by MinHash/LSH.
+
+    Returns None if no memory has a candidate partner. The returned deps show
+    the agent the clusters and limit it to the memories in them.
+    """
+    memories = await storage.get_memory_rows()
+    by_id = {cast(int, m.id): m for m in memories}
+    clusters = cast(
+        list[list[int]],
+        candidate_clusters((cast(int, m.id), cast(str, m.content)) for m in memories),
+    )
+    if not clusters:
+        return None
+
+    parts = [
+        f"## Possible duplicates {i}\n"
+        f"{storage.render_memories([by_id[mid] for mid in cluster], True)}"
+        for i, cluster in enumerate(clusters, 1)
+    ]
+    logger.info(
+        "deduplicator: %d of %d memories in %d candidate clusters",
+        sum(len(c) for c in clusters),
+        len(memories),
+        len(clusters),
+    )
+    return ToolDeps(
+        memory_ids={mid for cluster in clusters for mid in cluster},
+        memories="\n\n".join(parts),
+    )
+
+
+async def _run_sharded(
+    name: str, shard_size: int, concurrency: int, strategy: str
+) -> str:
+    prompt = MAINTENANCE_TASKS[name]
+    start_change_id = await storage.get_latest_change_id()
+    memories = await storage.get_memory_rows()
+    if strategy == "similarity":
+        shards = partition_by_similarity(memories, shard_size)
+    else:
+        shards = partition_by_time(memories, shard_size)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_shard(shard: list[Memory]) -> Any:
+        async with semaphore:
+            # restrict edits to the shard so concurrent runs never touch the
+            # same memory
+            deps = ToolDeps(
+                memory_ids={cast(int, m.id) for m in shard},
+                memories=storage.render_memories(shard, True),
+            )
+            res = await run_agent(name, prompt, deps)
+            return getattr(res, "output", None)
+
+    logger.info("%s: running %d shards", name, len(shards))
+    # A failing shard must not orphan the others: every shard runs to the
+    # end and failures are reported in the output.
+    outputs = await asyncio.gather(
+        *(run_shard(shard) for shard in shards), return_exceptions=True
+    )
+    parts = []
+    failed = 0
+    for i, out in enumerate(outputs, 1):
+        if isinstance(out, BaseException):
+            if not isinstance(out, Exception):
+                raise out
+            failed += 1
+            logger.error("%s: shard %d failed", name, i, exc_info=out)
+            parts.append(f"Shard {i} failed: {out!r}")
+        else:
+            parts.append(f"Shard {i}: {out}")
+
+    # Merge step: the shards could not see each other, so let one more run
+    # look at everything they wrote next to the related memories.
+    if await storage.get_latest_change_id() > start_change_id:
+        delta = await storage.get_memories_delta(start_change_id, MAINTENANCE_RELATED)
+        if delta is not None:
+            res = await run_agent(name, prompt, ToolDeps(memories=delta))
+            parts.append(f"Merge: {getattr(res, 'output', None)}")
+
+    # only a run in which every shard succeeded has seen every memory
+    await storage.set_maintenance_checkpoint(name, start_change_id, full=not failed)
+    return "\n\n".join(parts)
+
+
+async def run_maintenance_task(
+    name: str,
+    mode: str = "full",
+    shard_size: int = MAINTENANCE_SHARD_SIZE,
+    concurrency: int = MAINTENANCE_CONCURRENCY,
+    strategy: str = MAINTENANCE_SHARDING,
+) -> Any:
+    """Run the maintenance agent `name` in `mode` and return its output.
+
+    Returns None without calling the LLM if a delta run finds no changes.
+    `shard_size`, `concurrency` and `strategy` ("time" or "similarity")
+    only apply to the sharded mode.
+    """
+    if mode == "sharded":
+        return await _run_sharded(name, shard_size, concurrency, strategy)
+
+    prompt = MAINTENANCE_TASKS[name]
+    # Changes made while the agent runs (including its own edits) are left
+    # for the next run to look at.
+    start_change_id = await storage.get_latest_change_id()
+
+    checkpoint = await storage.get_maintenance_checkpoint(name)
+    now = get_current_naive_time()
+    recent_full = (
+        checkpoint is not None
+        and checkpoint.last_full_time is not None
+        and now - checkpoint.last_full_time < timedelta(hours=MAINTENANCE_FULL_HOURS)
+    )
+
+    full = True
+    memories: str | None = None
+    if mode == "delta":
+        if recent_full:
+            assert checkpoint is not None
+            full = False
+            last_change_id = cast(int, checkpoint.last_change_id)
+            if start_change_id <= last_change_id:
+                logger.info("%s: no memory changes since last run, skipping", name)
+                return None
+            memories = await storage.get_memories_delta(
+                last_change_id, MAINTENANCE_RELATED
+            )
+            if memories is None:
+                logger.info("%s: only deletions since last run, skipping", name)
+                await storage.set_maintenance_checkpoint(
+                    name, start_change_id, full=False
+                )
+                return None
+
+    deps = ToolDeps(memories=memories)
+    # Contradicting memories are no near-duplicates, so the prefilter only
+    # applies while an unfiltered pass ran within MAINTENANCE_FULL_HOURS.
+    if full and recent_full and name == "deduplicator" and DEDUP_PREFILTER == "minhash":
+        full = False
+        candidates = await _duplicate_candidates()
+        if candidates is None:
+            logger.info("%s: no near-duplicate candidates, skipping", name)
+            await storage.set_maintenance_checkpoint(name, start_change_id, full=False)
+            return None
+        deps = candidates
+
+    if deps.memories is None:
+        tokens = sum(map(storage.memory_tokens, await storage.get_memory_rows()))
+        if tokens > MAINTENANCE_TOKEN_BUDGET:
+            logger.info(
+                "%s: ~%d tokens of memories exceed the %d token budget, sharding",
+                name,
+                tokens,
+                MAINTENANCE_TOKEN_BUDGET,
+            )
+            return await _run_sharded(name, shard_size, concurrency, strategy)
+
+    res = await run_agent(name, prompt, deps)
+    await storage.set_maintenance_checkpoint(name, start_change_id, full=full)
+    return getattr(res, "output", None)
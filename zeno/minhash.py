@@ -0,0 +1,106 @@
+"""Near-duplicate detection for memories using MinHash and LSH banding.
+
+Every text is reduced to a set of character shingles, summarised by a MinHash
+signature and split into bands. Texts that agree on all rows of at least one
+band land in the same bucket and become candidate duplicates; candidates are
+then merged into clusters with a union-find. The whole pass is linear in the
+number of texts, and the probability that two texts become candidates rises
+steeply around a Jaccard similarity of (1 / bands) ** (1 / rows).
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Hashable, Iterable
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def shingles(text: str, k: int = 4) -> set[str]:
+    """Return the character k-shingles of normalised `text`."""
+    text = _SPACE_RE.sub(" ", text.lower()).strip()
+    if len(text) <= k:
+        return {text}
+    return {text[i : i + k] for i in range(len(text) - k + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Return the exact Jaccard similarity of the shingles of `a` and `b`."""
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+class MinHashLSH:
+    """Index of MinHash signatures bucketed by LSH bands.
+
+    `num_perm` must be a multiple of `bands`. The defaults (64 permutations
+    in 16 bands of 4 rows) flag pairs from a shingle similarity of about 0.5.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._num_perm = num_perm
+        self._seed = f"{seed}:".encode()
+        self._buckets: list[dict[tuple[int, ...], list[Hashable]]] = [
+            defaultdict(list) for _ in range(bands)
+        ]
+        self._keys: list[Hashable] = []
+
+    def signature(self, text: str) -> list[int]:
+        """Return the MinHash signature of `text`."""
+        # One extendable-output hash per shingle yields num_perm independent
+        # 32-bit hash values; the signature is their column-wise minimum.
+        size = 4 * self._num_perm
+        rows = []
+        for shingle in shingles(text):
+            digest = hashlib.shake_128(self._seed + shingle.encode()).digest(size)
+            rows.append(memoryview(digest).cast("I"))
+        return list(map(min, zip(*rows)))
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index `text` under `key`."""
+        sig = self.signature(text)
+        self._keys.append(key)
+        for band, buckets in enumerate(self._buckets):
+            start = band * self.rows
+            buckets[tuple(sig[start : start + self.rows])].append(key)
+
+    def clusters(self) -> list[list[Hashable]]:
+        """Return groups of keys that are candidate near-duplicates.
+
+        Keys without any candidate partner are not returned. Keys keep the
+        order in which they were added.
+        """
+        parent: dict[Hashable, Hashable] = {key: key for key in self._keys}
+
+        def find(key: Hashable) -> Hashable:
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for buckets in self._buckets:
+            for keys in buckets.values():
+                root = find(keys[0])
+                for other in keys[1:]:
+                    other_root = find(other)
+                    if other_root != root:
+                        parent[other_root] = root
+
+        groups: dict[Hashable, list[Hashable]] = defaultdict(list)
+        for key in self._keys:
+            groups[find(key)].append(key)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def candidate_clusters(
+    items: Iterable[tuple[Hashable, str]], **kwargs: int
+) -> list[list[Hashable]]:
+    """Index `(key, text)` pairs and return their near-duplicate clusters."""
+    index = MinHashLSH(**kwargs)
+    for key, text in items:
+        index.add(key, text)
+    return index.clusters()
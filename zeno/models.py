@@ -1,4 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, CheckConstraint
+from sqlalchemy import (
+    CheckConstraint,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 from .utils import get_current_time
@@ -13,9 +22,13 @@ class Memory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(String, nullable=False)
-    created_time = Column(DateTime, nullable=False)
-    # relevance: value in [0.0, 1.0], default 1.0. Kept mostly unused for now.
+    created_time = Column(DateTime, nullable=False, index=True)
+    # relevance: value in [0.0, 1.0], default 1.0. Recomputed periodically by
+    # zeno.relevance from recency, retrieval hits and reminder status.
     relevance = Column(Float, nullable=False, default=1.0)
+    # how often the memory was retrieved into a chat prompt, and when last
+    access_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_accessed = Column(DateTime, nullable=True)
 
     __table_args__ = (
         CheckConstraint(
@@ -26,7 +39,78 @@ class Memory(Base):
 
 class MessageArchive(Base):
     __tablename__ = "message_archive"
+    # ids must never be reused: archives keep them in message_archive_cold
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
+    created_time = Column(
+        DateTime, nullable=False, default=get_current_time, index=True
+    )
+
+
+class MessageArchiveCold(Base):
+    """Message archives moved out of message_archive once they got old.
+
+    `content` is the zlib-compressed archive JSON; ids are kept from
+    message_archive.
+    """
+
+    __tablename__ = "message_archive_cold"
+
+    id = Column(Integer, primary_key=True)
+    content = Column(LargeBinary, nullable=False)
+    created_time = Column(DateTime, nullable=False, index=True)
+
+
+class MemoryChange(Base):
+    """Append-only log of writes to the memory table."""
+
+    __tablename__ = "memory_change"
+
+    id = Column(Integer, primary_key=True, index=True)
+    memory_id = Column(Integer, nullable=False, index=True)
+    # one of "store", "update", "delete"
+    operation = Column(String, nullable=False)
     created_time = Column(DateTime, nullable=False, default=get_current_time)
+
+
+class MaintenanceCheckpoint(Base):
+    """Last memory change a maintenance agent or the reminder memory scan has
+    successfully processed."""
+
+    __tablename__ = "maintenance_checkpoint"
+
+    name = Column(String, primary_key=True)
+    last_change_id = Column(Integer, nullable=False)
+    last_full_time = Column(DateTime, nullable=True)
+    updated_time = Column(DateTime, nullable=False, default=get_current_time)
+
+
+class Reminder(Base):
+    """A scheduled message to the user."""
+
+    __tablename__ = "reminder"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message = Column(String, nullable=False)
+    # next time the reminder is due; NULL once a one-time reminder was sent
+    due_at = Column(DateTime, nullable=True, index=True)
+    # None for one-time reminders, otherwise one of RECURRENCES in zeno.utils
+    recurrence = Column(String, nullable=True)
+    last_sent_at = Column(DateTime, nullable=True)
+    created_time = Column(DateTime, nullable=False, default=get_current_time)
+
+
+class HistorySummary(Base):
+    """Rolling summary of the chat turns that fell out of the history window.
+
+    A single row (id 1) covering every archive up to `last_archive_id`.
+    """
+
+    __tablename__ = "history_summary"
+
+    id = Column(Integer, primary_key=True)
+    content = Column(Text, nullable=False)
+    last_archive_id = Column(Integer, nullable=False)
+    updated_time = Column(DateTime, nullable=False, default=get_current_time)
@@ -0,0 +1,69 @@
+"""Relevance scoring of memories.
+
+`Memory.relevance` is recomputed for all memories in one pass from three
+signals:
+
+- recency: halves every RELEVANCE_HALF_LIFE_DAYS since the memory was
+  created or last retrieved into a chat prompt,
+- access frequency: the number of retrieval hits, on a log scale that reaches
+  1.0 at RELEVANCE_ACCESS_SATURATION hits,
+- reminder status: memories mentioning reminders always score 1.0, like they
+  are always pinned in chat prompts.
+
+Recency and frequency are combined as 1 - (1 - recency) * (1 - frequency), so
+a memory is relevant if it is either recent or used a lot. The scores only
+change with time and retrieval hits, so the job runs once per maintenance
+cycle and writes back only scores that moved.
+"""
+
+import logging
+import math
+from datetime import datetime
+from typing import Sequence, cast
+
+from . import storage
+from .config import RELEVANCE_ACCESS_SATURATION, RELEVANCE_HALF_LIFE_DAYS
+from .models import Memory
+from .utils import get_current_naive_time
+
+logger = logging.getLogger("zeno.relevance")
+
+# scores closer than this to the stored value are not written back
+_TOLERANCE = 1e-3
+
+
+def score_memories(
+    memories: Sequence[Memory],
+    now: datetime,
+    half_life_days: float = RELEVANCE_HALF_LIFE_DAYS,
+    saturation: int = RELEVANCE_ACCESS_SATURATION,
+) -> dict[int, float]:
+    """Return the relevance of each of `memories` (id -> score in [0, 1])."""
+    decay = math.log(2) / (half_life_days * 86400)
+    norm = math.log1p(saturation)
+    scores: dict[int, float] = {}
+    for memory in memories:
+        id = cast(int, memory.id)
+        if storage.is_pinned(memory):
+            scores[id] = 1.0
+            continue
+        seen = max(memory.created_time, memory.last_accessed or memory.created_time)
+        age = max((now - seen).total_seconds(), 0.0)
+        recency = math.exp(-decay * age)
+        frequency = min(math.log1p(cast(int, memory.access_count or 0)) / norm, 1.0)
+        scores[id] = round(1.0 - (1.0 - recency) * (1.0 - frequency), 4)
+    return scores
+
+
+async def rescore_memories() -> int:
+    """Recompute the relevance of all memories and return how many changed."""
+    memories = await storage.get_memory_rows()
+    scores = score_memories(memories, get_current_naive_time())
+    changed: dict[int, float] = {}
+    for memory in memories:
+        id = cast(int, memory.id)
+        if abs(scores[id] - cast(float, memory.relevance)) > _TOLERANCE:
+            changed[id] = scores[id]
+    await storage.set_memory_relevance(changed)
+    logger.info("Rescored %d memories, %d changed", len(memories), len(changed))
+    return len(changed)
@@ -0,0 +1,81 @@
+"""Delivery of scheduled reminders from the reminder table, and the reminder
+agent's scan of reminders that only exist as memories.
+
+Finding due reminders is a cheap indexed query, so callers can poll often and
+only pay for Telegram delivery (or an LLM run) when something is actually due.
+Likewise the memory scan only calls the LLM when a memory mentioning reminders
+was stored or updated since the last scan, according to the memory change log.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, cast
+
+from . import storage
+from .agents import run_agent
+from .config import REMINDER_DELIVERY, REMINDER_MEMORY_SCAN
+from .tools import ToolDeps, deliver_message
+from .utils import get_current_naive_time, next_occurrence
+
+logger = logging.getLogger("zeno.reminder")
+
+# name of the memory scan's entry in the maintenance checkpoint table
+MEMORY_SCAN_CHECKPOINT = "reminder_scan"
+
+
+async def process_due_reminders(delivery: str = REMINDER_DELIVERY) -> int:
+    """Send all due reminders and return how many there were.
+
+    With delivery "direct" the reminder text is sent as is; with "agent" the
+    reminder agent phrases and sends them, and any reminder it didn't send is
+    sent as is afterwards. Recurring reminders are moved to their next
+    occurrence, one-time reminders are retired.
+    """
+    now = get_current_naive_time()
+    due = await storage.get_due_reminders(now)
+    if not due:
+        return 0
+
+    delivered: set[int] = set()
+    if delivery == "agent":
+        deps = ToolDeps(due=storage.render_reminders(due), delivered=delivered)
+        try:
+            resp = await run_agent("reminder", "Send the due reminders", deps)
+            logger.info("Reminder agent run complete: %s", resp.output)
+        except Exception:
+            # reminders the agent did send are still marked below
+            logger.exception("Reminder agent failed, sending due reminders as is")
+
+    for reminder in due:
+        if reminder.id not in delivered:
+            # mark each reminder right after sending it so a failure halfway
+            # through doesn't send the earlier ones twice
+            await deliver_message(cast(str, reminder.message), model_name="reminder")
+        next_due = (
+            next_occurrence(
+                cast(datetime, reminder.due_at), cast(str, reminder.recurrence), now
+            )
+            if reminder.recurrence
+            else None
+        )
+        await storage.mark_reminder_sent(cast(int, reminder.id), now, next_due)
+    return len(due)
+
+
+async def scan_reminder_memories(force: bool = REMINDER_MEMORY_SCAN) -> Any:
+    """Run the reminder agent over the memories and return its output.
+
+    Returns None without calling the LLM unless a memory mentioning reminders
+    was stored or updated since the last scan, or `force` is set. The scan's
+    own writes, like its "reminder sent" markers, don't count as changes.
+    """
+    checkpoint = await storage.get_maintenance_checkpoint(MEMORY_SCAN_CHECKPOINT)
+    since = 0 if checkpoint is None else cast(int, checkpoint.last_change_id)
+    if not force and not await storage.has_pinned_changes(since):
+        return None
+    resp = await run_agent("reminder", "Check for due reminders")
+    # past the run's own writes, so its markers don't trigger the next scan
+    await storage.set_maintenance_checkpoint(
+        MEMORY_SCAN_CHECKPOINT, await storage.get_latest_change_id(), full=True
+    )
+    return resp.output
@@ -0,0 +1,59 @@
+"""Health bookkeeping for the long-running tasks of the application.
+
+main.py runs the bot, the web API and the periodic loops as tasks of a single
+asyncio.TaskGroup. Each task is wrapped with `supervise()`, which records its
+state so the API can report per-task health.
+"""
+
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Coroutine
+
+from .utils import get_current_time
+
+logger = logging.getLogger("zeno.runtime")
+
+
+@dataclass
+class TaskHealth:
+    # "running", "stopped" (returned or cancelled) or "failed"
+    state: str
+    started_time: datetime
+    finished_time: datetime | None = None
+    error: str | None = None
+
+
+_health: dict[str, TaskHealth] = {}
+
+
+async def supervise(name: str, coro: Coroutine[Any, Any, Any]) -> Any:
+    """Await `coro` while tracking its health under `name`.
+
+    Exceptions are recorded and re-raised so the task group shuts down.
+    """
+    _health[name] = TaskHealth(state="running", started_time=get_current_time())
+    try:
+        result = await coro
+    except asyncio.CancelledError:
+        _finish(name, "stopped")
+        raise
+    except BaseException as exc:
+        logger.exception("Task %s failed", name)
+        _finish(name, "failed", repr(exc))
+        raise
+    _finish(name, "stopped")
+    return result
+
+
+def _finish(name: str, state: str, error: str | None = None) -> None:
+    health = _health[name]
+    health.state = state
+    health.finished_time = get_current_time()
+    health.error = error
+
+
+def get_health() -> dict[str, dict[str, Any]]:
+    """Return the health of every supervised task, keyed by task name."""
+    return {name: asdict(health) for name, health in _health.items()}
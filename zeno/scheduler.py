@@ -0,0 +1,94 @@
+"""Event-driven scheduler for reminder delivery.
+
+Instead of polling on a fixed grid, the scheduler looks up the earliest due
+time in the reminder table (a min() over the due_at index) and sleeps exactly
+until then. Writes to memories or reminders call `notify()`, which wakes the
+scheduler early so it can look up the due time again.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from . import storage
+from .utils import get_current_naive_time
+
+logger = logging.getLogger("zeno.reminder")
+
+
+class ReminderScheduler:
+    """Sleeps until the next reminder is due and then delivers it.
+
+    `max_sleep` bounds every sleep (in seconds) so clock changes such as DST
+    transitions are picked up; `retry_delay` is the pause after a failed
+    delivery before due reminders are tried again.
+    """
+
+    def __init__(self, max_sleep: float = 3600, retry_delay: float = 60) -> None:
+        self.max_sleep = max_sleep
+        self.retry_delay = retry_delay
+        self._next_due: datetime | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def notify(self) -> None:
+        """Wake the scheduler to look up the next due time. Safe to call from
+        any thread."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            wakeup.set()
+        else:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def reload(self) -> None:
+        """Look up the earliest due time of a pending reminder."""
+        self._next_due = await storage.get_next_due_time()
+
+    def seconds_until_next(self, now: datetime) -> float:
+        """Return how long to sleep before the earliest due time."""
+        if self._next_due is None:
+            return self.max_sleep
+        return min(self.max_sleep, max(0.0, (self._next_due - now).total_seconds()))
+
+    async def run(self, deliver: Callable[[], Awaitable[int]]) -> None:
+        """Call `deliver` whenever reminders are due. Runs forever.
+
+        `deliver` sends all due reminders and returns how many it sent,
+        e.g. zeno.reminders.process_due_reminders.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        while True:
+            # Clear before working so a notify() during the work is not lost.
+            self._wakeup.clear()
+            try:
+                sent = await deliver()
+                if sent:
+                    logger.info("Sent %d due reminders", sent)
+                await self.reload()
+                timeout = self.seconds_until_next(get_current_naive_time())
+            except Exception:
+                logger.exception("Reminder delivery failed")
+                timeout = self.retry_delay
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+
+# Process-wide scheduler; tools call notify_reminders_changed() after writes.
+reminder_scheduler = ReminderScheduler()
+
+
+def notify_reminders_changed() -> None:
+    """Wake the reminder scheduler after a memory or reminder was written."""
+    reminder_scheduler.notify()
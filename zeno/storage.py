@@ -1,12 +1,51 @@
-from typing import List
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+from typing import (
+    AsyncIterator,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Sequence,
+    cast,
+)
 import os
+import re
+import zlib
 
 from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
-from sqlalchemy import select, desc
+from sqlalchemy import (
+    CursorResult,
+    and_,
+    delete,
+    desc,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import Memory, MessageArchive
-from .utils import get_current_time
-from .db import AsyncSessionLocal, DATABASE_URL
+from .minhash import similarity
+from .models import (
+    HistorySummary,
+    MaintenanceCheckpoint,
+    Memory,
+    MemoryChange,
+    MessageArchive,
+    MessageArchiveCold,
+    Reminder,
+)
+from .utils import (
+    estimate_message_tokens,
+    estimate_tokens,
+    get_current_naive_time,
+    get_current_time,
+)
+from .db import AsyncReadSessionLocal, AsyncSessionLocal, DATABASE_URL, async_engine
 
 
 async def init_db() -> None:
@@ -52,12 +91,71 @@ async def init_db() -> None:
     return
 
 
-async def get_memories(show_id: bool) -> str:
-    """Return stored memories as plain text."""
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(Memory))
+# In-process caches of the rendered memory markdown and of packed memory
+# selections. Entries are keyed by the memory-table version counter below,
+# which the memory tools bump after every committed write, so a cached entry
+# is valid for as long as the version it was built against is current.
+_memory_version = 0
+_memories_cache: dict[tuple[bool, float, bool], tuple[int, str]] = {}
+_packed_cache: dict[tuple[int, float, int | None], tuple[int, "PackedMemories"]] = {}
+_memories_cache_stats = {"hits": 0, "misses": 0}
+
+
+def get_memory_version() -> int:
+    """Return the current memory-table version."""
+    return _memory_version
+
+
+def bump_memory_version() -> int:
+    """Mark the memory table as changed and return the new version.
+
+    Must be called after a write to the memory table has been committed.
+    """
+    global _memory_version
+    _memory_version += 1
+    return _memory_version
+
+
+def get_memories_cache_stats() -> dict[str, int]:
+    """Return hit/miss counters of the rendered memory cache."""
+    return dict(_memories_cache_stats)
+
+
+async def get_memories(
+    show_id: bool, min_relevance: float = 0.0, by_relevance: bool = False
+) -> str:
+    """Return stored memories as plain text.
+
+    Memories with a relevance below `min_relevance` are left out. They are
+    listed in table order, or most relevant first with `by_relevance`. The
+    rendered text is cached until the memory version changes.
+    """
+    # Read the version before querying: a write committed while the query
+    # runs bumps the version and therefore invalidates what we store here.
+    version = _memory_version
+    key = (show_id, min_relevance, by_relevance)
+    cached = _memories_cache.get(key)
+    if cached is not None and cached[0] == version:
+        _memories_cache_stats["hits"] += 1
+        return cached[1]
+    _memories_cache_stats["misses"] += 1
+
+    query = select(Memory)
+    if min_relevance > 0.0:
+        query = query.where(Memory.relevance >= min_relevance)
+    if by_relevance:
+        query = query.order_by(desc(Memory.relevance), Memory.created_time)
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(query)
         memories = result.scalars().all()
 
+    text = render_memories(memories, show_id)
+    _memories_cache[key] = (version, text)
+    return text
+
+
+def render_memories(memories: Sequence[Memory], show_id: bool) -> str:
+    """Render `memories` in the plain text format used in agent prompts."""
     parts: list[str] = []
     for memory in memories:
         if show_id:
@@ -68,42 +166,721 @@ async def get_memories(show_id: bool) -> str:
     return "\n".join(parts)
 
 
-async def get_old_messages(limit: int) -> List[ModelMessage]:
-    """Return the most recent message archives as a flat list of ModelMessage.
+class PackedMemories(NamedTuple):
+    """The memories chosen to fit a prompt budget and those left out."""
+
+    selected: list[Memory]
+    dropped: list[Memory]
+
+
+def memory_tokens(memory: Memory) -> int:
+    """Estimate the prompt tokens of `memory` as rendered with its ID."""
+    return estimate_tokens(cast(str, memory.content)) + 10  # id and timestamp lines
+
+
+# Word prefixes marking a memory as a reminder, in English ("remind me") and
+# German ("erinnere mich"), as users write in both.
+PINNED_PREFIXES = ("remind", "erinner")
+
+
+def is_pinned(memory: Memory) -> bool:
+    """Whether `memory` mentions reminders (see get_relevant_memories)."""
+    # same prefix match as the FTS5 query of _PINNED_SQL
+    return any(
+        word.startswith(PINNED_PREFIXES) for word in words(cast(str, memory.content))
+    )
+
+
+def rank_memories(memories: Iterable[Memory]) -> list[Memory]:
+    """Order `memories` for packing: pinned first, then by relevance, newest
+    first among equally relevant ones."""
+    return sorted(
+        memories,
+        key=lambda m: (is_pinned(m), m.relevance, m.created_time),
+        reverse=True,
+    )
+
+
+def pack_memories(
+    memories: Iterable[Memory], budget: int, pinned_budget: int | None = None
+) -> PackedMemories:
+    """Greedily take `memories` (in priority order) while they fit into
+    `budget` tokens.
+
+    A memory that doesn't fit is skipped, so smaller ones after it can still
+    use the remaining budget. Given a `pinned_budget`, pinned memories use at
+    most that many of the `budget` tokens. The selection is returned oldest
+    first, in the order memories are rendered in prompts.
+    """
+    selected: list[Memory] = []
+    dropped: list[Memory] = []
+    used = pinned_used = 0
+    pinned_limit = budget if pinned_budget is None else pinned_budget
+    for memory in memories:
+        cost = memory_tokens(memory)
+        pinned = pinned_budget is not None and is_pinned(memory)
+        if used + cost > budget or (pinned and pinned_used + cost > pinned_limit):
+            dropped.append(memory)
+            continue
+        selected.append(memory)
+        used += cost
+        if pinned:
+            pinned_used += cost
+    selected.sort(key=lambda m: (m.created_time, m.id))
+    return PackedMemories(selected, dropped)
+
+
+async def get_packed_memories(
+    budget: int, min_relevance: float = 0.0, pinned_budget: int | None = None
+) -> PackedMemories:
+    """Return the most valuable memories fitting into `budget` tokens.
+
+    Memories below `min_relevance` are not considered; `pinned_budget` is
+    passed on to pack_memories(). Like get_memories(), the result is cached
+    until the memory version changes.
+    """
+    version = _memory_version
+    key = (budget, min_relevance, pinned_budget)
+    cached = _packed_cache.get(key)
+    if cached is not None and cached[0] == version:
+        _memories_cache_stats["hits"] += 1
+        return cached[1]
+    _memories_cache_stats["misses"] += 1
+
+    query = select(Memory)
+    if min_relevance > 0.0:
+        query = query.where(Memory.relevance >= min_relevance)
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(query)
+        memories = result.scalars().all()
+
+    packed = pack_memories(rank_memories(memories), budget, pinned_budget)
+    _packed_cache[key] = (version, packed)
+    return packed
+
+
+async def get_memory_rows() -> list[Memory]:
+    """Return all memories ordered by creation time."""
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(select(Memory).order_by(Memory.created_time))
+        return list(result.scalars().all())
+
+
+async def list_memories(
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    min_relevance: float | None = None,
+) -> list[Memory]:
+    """Return up to `limit` memories ordered by (created_time, id).
+
+    `after` is the (created_time, id) of the last memory of a previous page.
+    `since` and `until` bound the creation time (`until` exclusive) and
+    `min_relevance` the relevance.
+    """
+    query = select(Memory)
+    if after is not None:
+        created_time, id = after
+        query = query.where(
+            or_(
+                Memory.created_time > created_time,
+                and_(Memory.created_time == created_time, Memory.id > id),
+            )
+        )
+    if since is not None:
+        query = query.where(Memory.created_time >= since)
+    if until is not None:
+        query = query.where(Memory.created_time < until)
+    if min_relevance is not None:
+        query = query.where(Memory.relevance >= min_relevance)
+    query = query.order_by(Memory.created_time, Memory.id).limit(limit)
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(query)
+        return list(result.scalars().all())
+
+
+def record_memory_change(session: AsyncSession, memory_id: int, operation: str) -> None:
+    """Append an entry to the memory change log.
+
+    The entry is added to `session` so it commits atomically with the write
+    it describes.
+    """
+    session.add(
+        MemoryChange(
+            memory_id=memory_id, operation=operation, created_time=get_current_time()
+        )
+    )
+
+
+async def record_memory_changes(
+    session: AsyncSession, memory_ids: Sequence[int], operation: str
+) -> None:
+    """Append one change log entry per id in a single statement."""
+    if not memory_ids:
+        return
+    now = get_current_time()
+    await session.execute(
+        insert(MemoryChange),
+        [
+            {"memory_id": memory_id, "operation": operation, "created_time": now}
+            for memory_id in memory_ids
+        ],
+    )
+
+
+async def get_latest_change_id() -> int:
+    """Return the id of the newest memory change log entry (0 if empty)."""
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(select(func.max(MemoryChange.id)))
+        return result.scalar() or 0
+
+
+async def get_maintenance_checkpoint(name: str) -> MaintenanceCheckpoint | None:
+    """Return the checkpoint of the maintenance agent `name`, if any."""
+    async with AsyncReadSessionLocal() as session:
+        return await session.get(MaintenanceCheckpoint, name)
+
+
+async def set_maintenance_checkpoint(name: str, change_id: int, full: bool) -> None:
+    """Record that agent `name` has processed all changes up to `change_id`.
+
+    `full` marks a run that saw every memory rather than a delta.
+    """
+    now = get_current_time()
+    values = {"last_change_id": change_id, "updated_time": now}
+    if full:
+        values["last_full_time"] = now
+    async with AsyncSessionLocal() as session:
+        # merge() leaves last_full_time alone unless it is given
+        await session.merge(MaintenanceCheckpoint(name=name, **values))
+        await session.commit()
+
+
+_WORD_RE = re.compile(r"\w{3,}")
+
+
+def words(text: str) -> set[str]:
+    """Return the set of lower-cased words (3+ characters) in `text`."""
+    return set(_WORD_RE.findall(text.lower()))
+
+
+# Words too common to say anything about relevance (English and German, as
+# users write in both). Words shorter than three characters are dropped by
+# words() anyway.
+_STOPWORDS = frozenset(
+    """
+    the and for are but not you your yours all any can had has have her his
+    him its our out was were what when where which who whom why how this that
+    these those with from into onto about than then them they their there
+    here been being does did doing will would should could shall may might
+    must just also very too some such only own same other more most much
+    der die das den dem des ein eine einen einem einer eines und oder aber
+    ist sind war waren bin bist hat habe haben hatte wird werden wurde mit
+    von für auf aus bei nach vor über unter zum zur ich du er sie wir ihr es
+    mir mich dir dich ihm ihn uns euch sich mein meine dein deine sein seine
+    nicht kein keine auch noch schon nur sehr wie was wer wann wo warum dass
+    """.split()
+)
+
+
+def _fts_query(query: str) -> str:
+    # Quote every word so user input can't inject FTS5 query syntax; OR them
+    # so BM25 ranks partial matches instead of requiring every word. Stopwords
+    # would match nearly every memory, so they are left out.
+    return " OR ".join(f'"{word}"' for word in sorted(words(query) - _STOPWORDS))
+
+
+_SEARCH_SQL = text(
+    "SELECT memory.* FROM memory_fts JOIN memory ON memory.id = memory_fts.rowid "
+    "WHERE memory_fts MATCH :query AND memory.relevance >= :min_relevance "
+    "ORDER BY bm25(memory_fts) LIMIT :limit"
+)
+
+
+async def _search(
+    session: AsyncSession, query: str, limit: int, min_relevance: float = 0.0
+) -> list[Memory]:
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+    result = await session.execute(
+        select(Memory).from_statement(_SEARCH_SQL),
+        {"query": fts_query, "limit": limit, "min_relevance": min_relevance},
+    )
+    return list(result.scalars().all())
+
+
+async def search_memories(query: str, limit: int) -> list[Memory]:
+    """Return up to `limit` memories matching `query`, best BM25 match first."""
+    async with AsyncReadSessionLocal() as session:
+        return await _search(session, query, limit)
+
+
+_PINNED_MATCH = " OR ".join(f"{prefix}*" for prefix in PINNED_PREFIXES)
+_PINNED_SQL = text(
+    "SELECT memory.* FROM memory_fts JOIN memory ON memory.id = memory_fts.rowid "
+    "WHERE memory_fts MATCH :pinned ORDER BY memory.created_time DESC LIMIT :limit"
+).bindparams(pinned=_PINNED_MATCH)
+_PINNED_CHANGES_SQL = text(
+    "SELECT 1 FROM memory_change "
+    "JOIN memory_fts ON memory_fts.rowid = memory_change.memory_id "
+    "WHERE memory_change.id > :since AND memory_change.operation != 'delete' "
+    "AND memory_fts MATCH :pinned LIMIT 1"
+).bindparams(pinned=_PINNED_MATCH)
+
+
+async def has_pinned_changes(since_change_id: int) -> bool:
+    """Whether a memory mentioning reminders was stored or updated after the
+    change log entry `since_change_id`, using the FTS index."""
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(_PINNED_CHANGES_SQL, {"since": since_change_id})
+        return result.first() is not None
+
+
+async def get_relevant_memories(
+    query: str, limit: int, min_relevance: float = 0.0
+) -> list[Memory]:
+    """Return memories to show for a conversation about `query`.
+
+    Memories mentioning reminders are pinned and come first (newest first),
+    followed by up to `limit` full-text matches for `query` with a relevance
+    of at least `min_relevance` in BM25 order.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(Memory).from_statement(_PINNED_SQL), {"limit": limit}
+        )
+        selected = {m.id: m for m in result.scalars().all()}
+        for memory in await _search(session, query, limit, min_relevance):
+            selected.setdefault(memory.id, memory)
+    return list(selected.values())
+
 
-    Archives are read newest-first from the DB; we reverse them to produce
-    chronological order for consumption by the chat agent.
+async def record_memory_access(memory_ids: Iterable[int]) -> None:
+    """Count a retrieval hit for each of `memory_ids`.
+
+    Access statistics only feed the relevance score, so this is neither
+    logged as a memory change nor bumps the memory version.
     """
-    messages: list[ModelMessage] = []
+    ids = list(memory_ids)
+    if not ids:
+        return
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            update(Memory)
+            .where(Memory.id.in_(ids))
+            .values(
+                access_count=Memory.access_count + 1,
+                last_accessed=get_current_naive_time(),
+            )
+        )
+        await session.commit()
+
+
+async def set_memory_relevance(scores: Mapping[int, float]) -> None:
+    """Write the relevance of many memories (id -> relevance) at once."""
+    if not scores:
+        return
     async with AsyncSessionLocal() as session:
+        # an executemany of one UPDATE statement keyed by primary key
+        await session.execute(
+            update(Memory),
+            [{"id": id, "relevance": relevance} for id, relevance in scores.items()],
+        )
+        await session.commit()
+    bump_memory_version()
+
+
+async def get_memories_delta(since_change_id: int, related: int) -> str | None:
+    """Return memories changed after `since_change_id` as plain text with IDs.
+
+    Each changed memory is accompanied by up to `related` other memories
+    that best match it in the full-text index, so agents can still spot
+    duplicates and aggregation partners among memories that did not change.
+    Returns None if none of the changed memories exist any more, i.e. the
+    changes were all deletions.
+    """
+    async with AsyncReadSessionLocal() as session:
         result = await session.execute(
-            select(MessageArchive)
+            select(Memory)
+            .where(
+                Memory.id.in_(
+                    select(MemoryChange.memory_id).where(
+                        MemoryChange.id > since_change_id
+                    )
+                )
+            )
+            .order_by(Memory.created_time)
+        )
+        changed = list(result.scalars().all())
+        if not changed:
+            return None
+        changed_ids = {m.id for m in changed}
+
+        context: dict[int, Memory] = {}
+        for memory in changed:
+            # over-fetch: the changed memories match themselves best
+            matches = await _search(
+                session, cast(str, memory.content), related + len(changed_ids)
+            )
+            others = [m for m in matches if m.id not in changed_ids]
+            context.update((cast(int, m.id), m) for m in others[:related])
+
+    related_memories = sorted(context.values(), key=lambda m: m.created_time)
+    return (
+        "## Changed memories\n"
+        f"{render_memories(changed, True)}\n\n"
+        "## Related memories (unchanged, for context)\n"
+        f"{render_memories(related_memories, True)}"
+    )
+
+
+class HistoryEntry(NamedTuple):
+    """A decoded message archive in the in-memory chat history."""
+
+    archive_id: int
+    messages: list[ModelMessage]
+    tokens: int
+
+
+# Decoded chat history: the newest MESSAGE_HISTORY_SIZE archives, oldest
+# first. It is loaded once by load_message_history() and appended to by
+# store_message_archive(), so the chat agent's history needs neither a query
+# nor JSON parsing. The lock keeps a store from slipping in between the load
+# query and the buffer being installed.
+MESSAGE_HISTORY_SIZE = 50
+_message_history: deque[HistoryEntry] | None = None
+_message_history_lock = asyncio.Lock()
+
+
+def _history_entry(archive_id: int, messages: Sequence[ModelMessage]) -> HistoryEntry:
+    messages = list(messages)
+    return HistoryEntry(archive_id, messages, estimate_message_tokens(messages))
+
+
+async def _read_archives(limit: int) -> list[HistoryEntry]:
+    """Read and decode the `limit` newest archives, oldest first.
+
+    Archives come from message_archive and, if that holds fewer than `limit`,
+    from the older, compressed message_archive_cold.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(MessageArchive.id, MessageArchive.content)
             .order_by(desc(MessageArchive.created_time))
             .limit(limit)
         )
-        archives = result.scalars().all()
+        rows = [(id, content) for id, content in result]
+        if len(rows) < limit:
+            result = await session.execute(
+                select(MessageArchiveCold.id, MessageArchiveCold.content)
+                .order_by(desc(MessageArchiveCold.created_time))
+                .limit(limit - len(rows))
+            )
+            rows += [(id, zlib.decompress(content)) for id, content in result]
+    return [
+        _history_entry(id, ModelMessagesTypeAdapter.validate_json(content))
+        for id, content in reversed(rows)
+    ]
+
+
+async def load_message_history() -> None:
+    """(Re)load the in-memory chat history from the database."""
+    global _message_history
+    async with _message_history_lock:
+        archives = await _read_archives(MESSAGE_HISTORY_SIZE)
+        _message_history = deque(archives, maxlen=MESSAGE_HISTORY_SIZE)
 
-    archivecounter = 0
-    for archive in reversed(archives):
-        msgs = ModelMessagesTypeAdapter.validate_json(archive.content)
-        messages.extend(msgs)
-        archivecounter += 1
-        if archivecounter >= limit:
-            break
 
-    return list(messages)
+async def get_history_entries() -> list[HistoryEntry]:
+    """Return the in-memory chat history, oldest archive first."""
+    if _message_history is None:
+        await load_message_history()
+    assert _message_history is not None
+    return list(_message_history)
+
+
+async def get_old_messages(limit: int) -> List[ModelMessage]:
+    """Return the `limit` most recent message archives as a flat list of
+    ModelMessage in chronological order.
+
+    Served from the in-memory history unless more archives are requested than
+    it holds.
+    """
+    if limit > MESSAGE_HISTORY_SIZE:
+        archives = await _read_archives(limit)
+    else:
+        archives = (await get_history_entries())[-limit:]
+    return [msg for archive in archives for msg in archive.messages]
+
 
+async def iter_message_archives(
+    limit: int,
+    before: tuple[datetime, int] | None = None,
+    batch_size: int = 100,
+) -> AsyncIterator[MessageArchive]:
+    """Yield up to `limit` message archives, newest first.
 
-async def store_message_archive(content: bytes | str) -> None:
+    `before` is the (created_time, id) of the last archive of a previous page;
+    only older archives are returned. Archives are read from message_archive
+    and then message_archive_cold in keyset-paginated batches of `batch_size`,
+    so memory use does not depend on `limit`. Cold archives are yielded
+    decompressed as (detached) MessageArchive objects.
+    """
+    for table in (MessageArchive, MessageArchiveCold):
+        while limit > 0:
+            query = select(table.id, table.content, table.created_time)
+            if before is not None:
+                created_time, id = before
+                query = query.where(
+                    or_(
+                        table.created_time < created_time,
+                        and_(table.created_time == created_time, table.id < id),
+                    )
+                )
+            query = query.order_by(desc(table.created_time), desc(table.id)).limit(
+                min(batch_size, limit)
+            )
+            # a short session per batch keeps slow clients from holding a read
+            # transaction open while the response is streamed
+            async with AsyncReadSessionLocal() as session:
+                rows = (await session.execute(query)).all()
+            for id, content, created_time in rows:
+                if table is MessageArchiveCold:
+                    content = zlib.decompress(content).decode()
+                yield MessageArchive(id=id, content=content, created_time=created_time)
+            if not rows:
+                break
+            limit -= len(rows)
+            last_id, _, last_created_time = rows[-1]
+            before = (last_created_time, last_id)
+
+
+async def store_message_archive(
+    content: bytes | str, messages: Sequence[ModelMessage] | None = None
+) -> None:
     """Persist a serialized message archive.
 
     Accepts bytes or str. If bytes are provided, decode to UTF-8 text
     before storing because the DB column is TEXT and archives are JSON.
+    `messages` are the already decoded messages of `content`; if given, the
+    in-memory history is updated without parsing `content` again.
     """
     if isinstance(content, (bytes, bytearray)):
         content = content.decode()
 
     archive = MessageArchive(content=content, created_time=get_current_time())
+    async with _message_history_lock:
+        async with AsyncSessionLocal() as session:
+            session.add(archive)
+            await session.commit()
+        if _message_history is not None:
+            if messages is None:
+                messages = ModelMessagesTypeAdapter.validate_json(content)
+            _message_history.append(_history_entry(cast(int, archive.id), messages))
+
+
+async def compact_message_archive(
+    compress_before: datetime,
+    delete_before: datetime | None,
+    batch_size: int = 500,
+) -> tuple[int, int]:
+    """Move archives older than `compress_before` to the compressed cold
+    table and delete cold archives older than `delete_before`.
+
+    Only cold archives the chat history summary already covers are deleted,
+    so nothing is lost that the summary doesn't hold. Works in batches of `batch_size` archives so the write lock is never held
+    for long. Returns the number of archives compressed and deleted.
+    """
+    # Archives keep their ids in the cold table; message_archive uses
+    # AUTOINCREMENT, so SQLite never hands them out again.
+    compressed = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(MessageArchive)
+                .where(MessageArchive.created_time < compress_before)
+                .order_by(MessageArchive.id)
+                .limit(batch_size)
+            )
+            archives = result.scalars().all()
+            if not archives:
+                break
+            session.add_all(
+                MessageArchiveCold(
+                    id=archive.id,
+                    content=zlib.compress(archive.content.encode()),
+                    created_time=archive.created_time,
+                )
+                for archive in archives
+            )
+            await session.execute(
+                delete(MessageArchive).where(
+                    MessageArchive.id.in_([a.id for a in archives])
+                )
+            )
+            await session.commit()
+        compressed += len(archives)
+
+    deleted = 0
+    if delete_before is not None:
+        # NULL without a summary, which matches no archive
+        summarized = (
+            select(HistorySummary.last_archive_id)
+            .where(HistorySummary.id == 1)
+            .scalar_subquery()
+        )
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(MessageArchiveCold).where(
+                    MessageArchiveCold.created_time < delete_before,
+                    MessageArchiveCold.id <= summarized,
+                )
+            )
+            await session.commit()
+            deleted = cast(CursorResult, result).rowcount
+    return compressed, deleted
+
+
+async def incremental_vacuum() -> None:
+    """Return free pages to the filesystem.
+
+    Only has an effect on databases with auto_vacuum=INCREMENTAL, which the
+    migrations set up.
+    """
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql("PRAGMA incremental_vacuum")
+        await conn.commit()
+
+
+# The rolling summary is read on every chat message, so it is cached here
+# and only written through set_history_summary().
+_history_summary: HistorySummary | None = None
+_history_summary_loaded = False
+
+
+async def get_history_summary() -> HistorySummary | None:
+    """Return the rolling summary of the chat turns outside the window."""
+    global _history_summary, _history_summary_loaded
+    if not _history_summary_loaded:
+        async with AsyncReadSessionLocal() as session:
+            _history_summary = await session.get(HistorySummary, 1)
+        _history_summary_loaded = True
+    return _history_summary
+
+
+async def set_history_summary(content: str, last_archive_id: int) -> None:
+    """Replace the rolling summary, which now covers `last_archive_id`."""
+    global _history_summary, _history_summary_loaded
+    async with AsyncSessionLocal() as session:
+        summary = await session.merge(
+            HistorySummary(
+                id=1,
+                content=content,
+                last_archive_id=last_archive_id,
+                updated_time=get_current_time(),
+            )
+        )
+        await session.commit()
+    _history_summary, _history_summary_loaded = summary, True
+
+
+def add_reminder(
+    session: AsyncSession, message: str, due_at: datetime, recurrence: str | None
+) -> Reminder:
+    """Add a reminder to `session`; it is stored when the session commits."""
+    reminder = Reminder(
+        message=message,
+        due_at=due_at,
+        recurrence=recurrence,
+        created_time=get_current_time(),
+    )
+    session.add(reminder)
+    return reminder
+
+
+async def get_due_reminders(now: datetime) -> list[Reminder]:
+    """Return reminders due at or before `now`, oldest first.
+
+    This is a range scan on the due_at index and therefore cheap to poll.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(Reminder).where(Reminder.due_at <= now).order_by(Reminder.due_at)
+        )
+        return list(result.scalars().all())
+
+
+async def get_scheduled_reminders(limit: int) -> list[Reminder]:
+    """Return the next `limit` pending reminders, earliest first."""
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(Reminder)
+            .where(Reminder.due_at.is_not(None))
+            .order_by(Reminder.due_at)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+
+def render_reminders(reminders: Sequence[Reminder]) -> str:
+    """Render `reminders` as a list for agent prompts."""
+    return "\n".join(
+        f"- ID {r.id}, {r.due_at.strftime('%Y-%m-%d %H:%M')}"
+        f"{f' ({r.recurrence})' if r.recurrence else ''}: {r.message}"
+        for r in reminders
+    )
+
+
+async def find_scheduled_reminder(
+    message: str,
+    now: datetime,
+    window: timedelta = timedelta(hours=1),
+    min_similarity: float = 0.5,
+) -> Reminder | None:
+    """Return a scheduled reminder `message` repeats, if there is one.
+
+    Only reminders due within `window` of `now` or sent during the last
+    `window` are considered: those are the ones the scheduler sends (or has
+    just sent) on its own.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(
+            select(Reminder).where(
+                or_(
+                    Reminder.due_at.between(now - window, now + window),
+                    Reminder.last_sent_at >= now - window,
+                )
+            )
+        )
+        for reminder in result.scalars().all():
+            if similarity(message, cast(str, reminder.message)) >= min_similarity:
+                return reminder
+    return None
+
+
+async def get_next_due_time() -> datetime | None:
+    """Return the earliest due time of a pending reminder, if any.
+
+    min() over the due_at index only reads the first index entry.
+    """
+    async with AsyncReadSessionLocal() as session:
+        result = await session.execute(select(func.min(Reminder.due_at)))
+        return result.scalar()
+
+
+async def mark_reminder_sent(
+    id: int, sent_at: datetime, next_due: datetime | None
+) -> None:
+    """Record delivery of reminder `id` and schedule its next occurrence.
+
+    `next_due` is None for one-time reminders, which are then never due again.
+    """
     async with AsyncSessionLocal() as session:
-        session.add(archive)
+        await session.execute(
+            update(Reminder)
+            .where(Reminder.id == id)
+            .values(last_sent_at=sent_at, due_at=next_due)
+        )
         await session.commit()
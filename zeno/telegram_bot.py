@@ -1,18 +1,164 @@
+import asyncio
 import logging
-import os
+from dataclasses import dataclass
+from datetime import timedelta
 
 import dotenv
 import logfire
-from telegram import Update
+from pydantic_ai.messages import ModelMessage, ModelRequest, UserPromptPart
+from telegram import Bot, Message, Update
+from telegram.constants import ChatAction, MessageLimit
+from telegram.error import RetryAfter, TelegramError
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     ContextTypes,
+    ExtBot,
     MessageHandler,
     filters,
 )
 
-from .storage import get_old_messages, init_db, store_message_archive
+from .storage import init_db, store_message_archive
+from .telegram_client import shared_bot
+
+logger = logging.getLogger("zeno.telegram_bot")
+
+
+@dataclass
+class _Inbox:
+    """Messages of one chat waiting for the next agent run."""
+
+    texts: list[str]
+    last_arrival: float
+
+
+# Updates are handled concurrently (see build_application). The first message
+# of a chat starts a drain loop in its handler; messages arriving until the
+# chat has been quiet for CHAT_DEBOUNCE_SECONDS, or while a run is in flight,
+# are queued and answered together by one run. One loop per chat also keeps
+# turns in order, so each run sees the history the previous one stored.
+_inboxes: dict[int, _Inbox] = {}
+
+
+def _retrieval_query(text: str, history: list[ModelMessage], turns: int = 3) -> str:
+    """Combine `text` with the last few user prompts to look up memories."""
+    prompts = [
+        part.content
+        for msg in history
+        if isinstance(msg, ModelRequest)
+        for part in msg.parts
+        if isinstance(part, UserPromptPart) and isinstance(part.content, str)
+    ]
+    return "\n".join([*prompts[-turns:], text])
+
+
+class StreamingReply:
+    """A reply that is shown while the chat agent is still generating it.
+
+    start() sends a placeholder message and keeps a typing action up;
+    update() edits the placeholder with the text so far, at most once every
+    `interval` seconds (Telegram rate limits edits); finish() shows the final
+    text, falling back to split_and_send() if it is too long for one message.
+    """
+
+    PLACEHOLDER = "…"
+    # Telegram shows a chat action for about five seconds
+    TYPING_EVERY = 4.0
+
+    def __init__(self, bot: Bot, chat_id: int, interval: float) -> None:
+        self._bot = bot
+        self._chat_id = chat_id
+        self._interval = interval
+        self._message: Message | None = None
+        self._shown = ""
+        self._next_edit = 0.0
+        self._typing: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._message = await self._bot.send_message(
+            chat_id=self._chat_id, text=self.PLACEHOLDER
+        )
+        # only once the placeholder is out: if sending it fails, nothing is
+        # left to discard() the typing task
+        self._typing = asyncio.create_task(self._keep_typing())
+        self._shown = self.PLACEHOLDER
+        self._next_edit = self._now() + self._interval
+
+    async def update(self, text: str) -> None:
+        if self._now() >= self._next_edit:
+            if len(text) > MessageLimit.MAX_TEXT_LENGTH:
+                text = text[: MessageLimit.MAX_TEXT_LENGTH - 1] + "…"
+            await self._edit(text)
+
+    async def finish(self, text: str) -> None:
+        self._stop_typing()
+        text = text.strip()
+        if text and len(text) <= MessageLimit.MAX_TEXT_LENGTH:
+            await asyncio.sleep(max(self._next_edit - self._now(), 0.0))
+            if await self._edit(text):
+                return
+        await self.discard()
+        from .utils import split_and_send
+
+        await split_and_send(
+            send=self._bot.send_message, chat_id=self._chat_id, text=text
+        )
+
+    async def discard(self) -> None:
+        """Remove the placeholder, e.g. because the agent run failed."""
+        self._stop_typing()
+        if self._message is not None:
+            try:
+                await self._bot.delete_message(
+                    chat_id=self._chat_id, message_id=self._message.message_id
+                )
+            except TelegramError:
+                logger.warning("Could not delete the reply placeholder")
+            self._message = None
+
+    async def _edit(self, text: str) -> bool:
+        """Show `text` in the placeholder; returns False if that failed."""
+        text = text.strip()
+        if self._message is None or not text:
+            return False
+        if text == self._shown:
+            return True
+        try:
+            await self._bot.edit_message_text(
+                text, chat_id=self._chat_id, message_id=self._message.message_id
+            )
+        except RetryAfter as exc:
+            delay = exc.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            self._next_edit = self._now() + delay
+            return False
+        except TelegramError:
+            logger.warning("Editing the streamed reply failed", exc_info=True)
+            return False
+        self._shown = text
+        self._next_edit = self._now() + self._interval
+        return True
+
+    async def _keep_typing(self) -> None:
+        while True:
+            try:
+                await self._bot.send_chat_action(
+                    chat_id=self._chat_id, action=ChatAction.TYPING
+                )
+            except TelegramError:
+                logger.debug("Sending the typing action failed", exc_info=True)
+            await asyncio.sleep(self.TYPING_EVERY)
+
+    def _stop_typing(self) -> None:
+        if self._typing is not None:
+            self._typing.cancel()
+            self._typing = None
+
+    @staticmethod
+    def _now() -> float:
+        return asyncio.get_running_loop().time()
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -28,6 +174,44 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logfire.info(f"Received /start from {chat.id}")
 
 
+async def _answer(bot: Bot, chat_id: int, text: str) -> None:
+    """Run the chat agent on `text`, archive the turn and send the reply."""
+    from .agents import run_agent, stream_agent
+    from .config import CHAT_STREAM_EDIT_INTERVAL, CHAT_STREAMING
+    from .history import get_chat_history, schedule_summary
+    from .tools import ToolDeps
+    from .utils import split_and_send
+
+    history, summary = await get_chat_history()
+    deps = ToolDeps(query=_retrieval_query(text, history), summary=summary)
+    if CHAT_STREAMING:
+        reply = StreamingReply(bot, chat_id, CHAT_STREAM_EDIT_INTERVAL)
+        await reply.start()
+        try:
+            response = await stream_agent(
+                "chat", text, reply.update, deps, message_history=history
+            )
+            await store_message_archive(
+                response.new_messages_json(), response.new_messages()
+            )
+        except BaseException:
+            # also stops the typing action
+            await reply.discard()
+            raise
+        await reply.finish(response.output)
+    else:
+        response = await run_agent("chat", text, deps, message_history=history)
+        # use storage helper to persist the message archive
+        await store_message_archive(
+            response.new_messages_json(), response.new_messages()
+        )
+        await split_and_send(
+            send=bot.send_message, chat_id=chat_id, text=response.output
+        )
+    # older turns may have left the history window
+    schedule_summary()
+
+
 async def run_chat_agent(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat = update.effective_chat
     message = update.message
@@ -52,21 +236,83 @@ async def run_chat_agent(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logfire.info(f"Unauthorized access attempt from user {message.from_user.id}")
         return
 
-    from .agents import build_chat_agent
+    now = asyncio.get_running_loop().time()
+    inbox = _inboxes.get(chat.id)
+    if inbox is not None:
+        inbox.texts.append(message.text)
+        inbox.last_arrival = now
+        return
 
-    chatagent = await build_chat_agent()
+    inbox = _inboxes[chat.id] = _Inbox([message.text], now)
+    # show that a reply is coming while the debounce delay runs
+    try:
+        await context.bot.send_chat_action(chat_id=chat.id, action=ChatAction.TYPING)
+    except TelegramError:
+        logger.debug("Sending the typing action failed", exc_info=True)
     logfire.info(f"Running chat agent for user {message.from_user.id}")
-    history = await get_old_messages(10)
-    response = await chatagent.run(message.text, message_history=history)
-    messages = response.new_messages_json()
-    # use storage helper to persist the message archive
-    await store_message_archive(messages)
-    from .utils import split_and_send
+    await _drain(context.bot, chat.id, inbox)
 
-    await split_and_send(
-        send=context.bot.send_message, chat_id=chat.id, text=response.output
+
+async def _drain(bot: Bot, chat_id: int, inbox: _Inbox) -> None:
+    """Answer the messages queued in `inbox` until none are left."""
+    from .config import CHAT_DEBOUNCE_SECONDS
+
+    loop = asyncio.get_running_loop()
+    try:
+        while inbox.texts:
+            wait = inbox.last_arrival + CHAT_DEBOUNCE_SECONDS - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            texts, inbox.texts = inbox.texts, []
+            if len(texts) > 1:
+                logger.info("Answering %d messages in one run", len(texts))
+            try:
+                await _answer(bot, chat_id, "\n".join(texts))
+            except Exception:
+                logger.exception("Chat agent run failed")
+            else:
+                logfire.info(f"Responded to chat {chat_id} via bot")
+    finally:
+        del _inboxes[chat_id]
+
+
+def build_application(bot: ExtBot) -> Application:
+    """Build the telegram Application with all handlers registered.
+
+    `bot` is normally telegram_client.shared_bot(), so replies and reminders
+    share one connection pool.
+    """
+    # Updates are processed concurrently so a slow LLM run doesn't hold up
+    # /start or other chats; turns within a chat are serialized by _drain().
+    application = ApplicationBuilder().bot(bot).concurrent_updates(True).build()
+    start_handler = CommandHandler("start", start)
+    chat_handler = MessageHandler(
+        filters.USER & filters.TEXT & (~filters.COMMAND), run_chat_agent
     )
-    logfire.info(f"Responded to user {message.from_user.id} via bot")
+    application.add_handler(start_handler)
+    application.add_handler(chat_handler)
+    return application
+
+
+async def serve_bot() -> None:
+    """Poll telegram for updates on the running event loop until cancelled.
+
+    Unlike run_bot(), this neither owns the event loop nor initializes the
+    database, so it can run next to other tasks (see main.py).
+    """
+    application = build_application(shared_bot())
+    # the builder always creates an updater unless told not to
+    updater = application.updater
+    assert updater is not None
+    async with application:
+        await application.start()
+        await updater.start_polling()
+        try:
+            await asyncio.Future()  # run until cancelled
+        finally:
+            await updater.stop()
+            await application.stop()
 
 
 def run_bot() -> None:
@@ -86,27 +332,15 @@ def run_bot() -> None:
     #
     # before starting the bot. We log a helpful message here rather than
     # attempting to create the schema at runtime.
-    import asyncio as _asyncio
 
     # Ensure DB directory exists and schema is present (Alembic-managed).
     # storage.init_db() will raise if the schema is not initialized.
-    _asyncio.run(init_db())
+    asyncio.run(init_db())
 
     # Ensure main thread has an event loop for libraries that call get_event_loop()
     try:
-        _asyncio.get_running_loop()
+        asyncio.get_running_loop()
     except RuntimeError:
-        _asyncio.set_event_loop(_asyncio.new_event_loop())
+        asyncio.set_event_loop(asyncio.new_event_loop())
 
-    token = os.environ.get("TELEGRAM_BOT_TOKEN")
-    if not token:
-        raise RuntimeError("TELEGRAM_BOT_TOKEN not set in environment")
-
-    application = ApplicationBuilder().token(token).build()
-    start_handler = CommandHandler("start", start)
-    chat_handler = MessageHandler(
-        filters.USER & filters.TEXT & (~filters.COMMAND), run_chat_agent
-    )
-    application.add_handler(start_handler)
-    application.add_handler(chat_handler)
-    application.run_polling()
+    build_application(shared_bot()).run_polling()
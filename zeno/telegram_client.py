@@ -0,0 +1,55 @@
+"""Process-wide Telegram client shared by the bot and outbound sends.
+
+Creating a `telegram.Bot` per message means a new HTTP client, TLS handshake
+and `getMe` call every time. Instead one bot, backed by a pooled HTTPXRequest,
+is created lazily and reused by the telegram Application and by reminder
+delivery, and closed once on shutdown.
+"""
+
+import os
+
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+
+# Connections kept open for outbound API calls (sendMessage etc.); long
+# polling uses its own single-connection request.
+POOL_SIZE = 8
+
+_bot: ExtBot | None = None
+
+
+def get_token() -> str:
+    token = os.environ.get("TELEGRAM_BOT_TOKEN")
+    if not token:
+        raise RuntimeError("TELEGRAM_BOT_TOKEN not set in environment")
+    return token
+
+
+def shared_bot() -> ExtBot:
+    """Return the shared bot, creating it on first use without initializing it.
+
+    Use this where the caller initializes the bot itself, e.g. a telegram
+    Application; otherwise use `get_bot()`.
+    """
+    global _bot
+    if _bot is None:
+        _bot = ExtBot(
+            token=get_token(),
+            request=HTTPXRequest(connection_pool_size=POOL_SIZE),
+            get_updates_request=HTTPXRequest(),
+        )
+    return _bot
+
+
+async def get_bot() -> ExtBot:
+    """Return the shared bot, initialized and ready to send."""
+    bot = shared_bot()
+    # no-op once initialized; re-opens the connection pool after close_bot()
+    await bot.initialize()
+    return bot
+
+
+async def close_bot() -> None:
+    """Close the shared bot's connection pool, if it was ever created."""
+    if _bot is not None:
+        await _bot.shutdown()
@@ -7,19 +7,117 @@ description, parameter names and types, and the return type.
 
 import os
 import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Sequence, cast
+from zoneinfo import ZoneInfo
 
-from pydantic_ai import RunContext
+from pydantic_ai import ModelRetry, RunContext
 from pydantic_ai.messages import ModelMessagesTypeAdapter, ModelResponse, TextPart
 from pydantic_ai.usage import RequestUsage
-from telegram import Bot
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .config import TELEGRAM_CHAT_ID
 from .models import Memory
-from .storage import AsyncSessionLocal, store_message_archive
-from .utils import get_current_time, split_and_send
+from .storage import (
+    AsyncSessionLocal,
+    add_reminder,
+    bump_memory_version,
+    record_memory_change,
+    record_memory_changes,
+    find_scheduled_reminder,
+    store_message_archive,
+)
+from .scheduler import notify_reminders_changed
+from .telegram_client import get_bot
+from .utils import (
+    RECURRENCES,
+    get_current_naive_time,
+    get_current_time,
+    split_and_send,
+)
 
 
-async def delete_memory(ctx: RunContext, id: int) -> None:
+# A buffered memory or reminder tool write; returns whether it changed anything.
+MemoryWrite = Callable[[AsyncSession], Awaitable[bool]]
+
+
+@dataclass
+class ToolDeps:
+    """Per-run dependencies of the agents and their tools, passed as agent deps."""
+
+    # ids the agent may delete or update; None means no restriction
+    memory_ids: set[int] | None = None
+    # memories section shown instead of every memory, e.g. a delta
+    memories: str | None = None
+    # conversation the chat agent retrieves relevant memories for
+    query: str | None = None
+    # scheduled reminders the reminder agent has to send now
+    due: str | None = None
+    # ids of the due reminders the reminder agent has sent
+    delivered: set[int] | None = None
+    # rolling summary of the chat turns outside the history window
+    summary: str | None = None
+    # memory and reminder writes buffered by unit_of_work(); None applies
+    # them at once
+    writes: list[MemoryWrite] | None = None
+
+
+def _check_scope(ctx: RunContext[ToolDeps] | None, id: int) -> None:
+    deps = getattr(ctx, "deps", None)
+    if isinstance(deps, ToolDeps) and deps.memory_ids is not None:
+        if id not in deps.memory_ids:
+            raise ModelRetry(f"Memory {id} is not part of the memories you were given")
+
+
+def _memories_changed() -> None:
+    bump_memory_version()
+    notify_reminders_changed()
+
+
+async def _write(ctx: RunContext[ToolDeps] | None, write: MemoryWrite) -> None:
+    """Apply `write` now, or buffer it if the run has a unit of work."""
+    deps = getattr(ctx, "deps", None)
+    if isinstance(deps, ToolDeps) and deps.writes is not None:
+        deps.writes.append(write)
+        return
+    async with AsyncSessionLocal() as session:  # type: ignore
+        if await write(session):
+            await session.commit()
+            _memories_changed()
+
+
+async def apply_writes(writes: Sequence[MemoryWrite]) -> None:
+    """Apply buffered memory writes in a single transaction."""
+    async with AsyncSessionLocal() as session:  # type: ignore
+        changed = [await write(session) for write in writes]
+        if any(changed):
+            await session.commit()
+            _memories_changed()
+
+
+@asynccontextmanager
+async def unit_of_work(deps: ToolDeps) -> AsyncIterator[ToolDeps]:
+    """Collect the memory and reminder writes of an agent run and commit them
+    at the end.
+
+    The writes are buffered rather than kept in an open transaction, because
+    SQLite would otherwise hold its write lock for the whole run, LLM calls
+    included. If the run raises, the buffered writes are discarded.
+    """
+    deps.writes = []
+    try:
+        yield deps
+        writes = deps.writes
+    finally:
+        deps.writes = None
+    if writes:
+        await apply_writes(writes)
+
+
+async def delete_memory(ctx: RunContext[ToolDeps], id: int) -> None:
     """Delete Memory.
 
     Delete the memory with the given id.
@@ -30,14 +128,20 @@ async def delete_memory(ctx: RunContext, id: int) -> None:
     Returns
     - None
     """
-    async with AsyncSessionLocal() as session:  # type: ignore
+    _check_scope(ctx, id)
+
+    async def write(session: AsyncSession) -> bool:
         memory = await session.get(Memory, id)
-        if memory:
-            await session.delete(memory)
-            await session.commit()
+        if memory is None:
+            return False
+        await session.delete(memory)
+        record_memory_change(session, id, "delete")
+        return True
+
+    await _write(ctx, write)
 
 
-async def store_memory(ctx: RunContext, content: str) -> None:
+async def store_memory(ctx: RunContext[ToolDeps], content: str) -> None:
     """Save Memory.
 
     Store a new memory with the provided content.
@@ -48,15 +152,21 @@ async def store_memory(ctx: RunContext, content: str) -> None:
     Returns
     - int: id of created memory
     """
-    memory = Memory(content=content, created_time=get_current_time())
-    async with AsyncSessionLocal() as session:  # type: ignore
+    created_time = get_current_time()
+
+    async def write(session: AsyncSession) -> bool:
+        memory = Memory(content=content, created_time=created_time)
         session.add(memory)
-        await session.commit()
-        # no return value needed
-        return None
+        await session.flush()
+        record_memory_change(session, cast(int, memory.id), "store")
+        return True
+
+    await _write(ctx, write)
+    # no return value needed
+    return None
 
 
-async def update_memory(ctx: RunContext, id: int, content: str) -> None:
+async def update_memory(ctx: RunContext[ToolDeps], id: int, content: str) -> None:
     """Update Memory.
 
     Replace the content of an existing memory.
@@ -68,36 +178,122 @@ async def update_memory(ctx: RunContext, id: int, content: str) -> None:
     Returns
     - Optional[int]: id if updated, else None
     """
-    async with AsyncSessionLocal() as session:  # type: ignore
+    _check_scope(ctx, id)
+    updated_time = get_current_time()
+
+    async def write(session: AsyncSession) -> bool:
         memory = await session.get(Memory, id)
-        if memory:
-            memory.content = content
-            memory.created_time = get_current_time()
-            session.add(memory)
-            await session.commit()
-            # no return value needed
-        return None
+        if memory is None:
+            return False
+        memory.content = content
+        memory.created_time = updated_time
+        session.add(memory)
+        record_memory_change(session, id, "update")
+        return True
 
+    await _write(ctx, write)
+    # no return value needed
+    return None
 
-async def send_reminder(ctx: RunContext, message: str) -> None:
-    """Send Reminder.
 
-    Send `message` to the configured Telegram chat and record it in the message archive.
+async def delete_memories(ctx: RunContext[ToolDeps], ids: list[int]) -> None:
+    """Delete Memories.
+
+    Delete all memories with the given ids in one call.
+
+    Parameters
+    - ids: list[int]
+
+    Returns
+    - None
+    """
+    for id in ids:
+        _check_scope(ctx, id)
+
+    async def write(session: AsyncSession) -> bool:
+        result = await session.execute(
+            delete(Memory).where(Memory.id.in_(ids)).returning(Memory.id)
+        )
+        deleted = result.scalars().all()
+        await record_memory_changes(session, deleted, "delete")
+        return bool(deleted)
+
+    if ids:
+        await _write(ctx, write)
+
+
+async def store_memories(ctx: RunContext[ToolDeps], contents: list[str]) -> None:
+    """Save Memories.
+
+    Store several new memories in one call, one per content.
+
+    Parameters
+    - contents: list[str]
+
+    Returns
+    - None
+    """
+    created_time = get_current_time()
+
+    async def write(session: AsyncSession) -> bool:
+        result = await session.execute(
+            insert(Memory).returning(Memory.id),
+            [{"content": c, "created_time": created_time} for c in contents],
+        )
+        await record_memory_changes(session, result.scalars().all(), "store")
+        return True
+
+    if contents:
+        await _write(ctx, write)
+
+
+async def create_reminder(
+    ctx: RunContext[ToolDeps], message: str, due_at: str, recurrence: str | None = None
+) -> None:
+    """Create Reminder.
+
+    Schedule `message` to be sent to the user at `due_at`.
 
     Parameters
     - message: str
+    - due_at: str: ISO 8601 local date and time, e.g. 2025-03-04T09:00
+    - recurrence: Optional[str]: one of hourly, daily, weekly, monthly, yearly;
+      omit for a one-time reminder
 
     Returns
     - None
     """
-    token = os.environ.get("TELEGRAM_BOT_TOKEN")
+    try:
+        due = datetime.fromisoformat(due_at)
+    except ValueError:
+        raise ModelRetry(
+            f"due_at {due_at!r} is not an ISO 8601 date and time"
+        ) from None
+    if due.tzinfo is not None:
+        due = due.astimezone(ZoneInfo("Europe/Berlin")).replace(tzinfo=None)
+    if recurrence is not None and recurrence not in RECURRENCES:
+        raise ModelRetry(f"recurrence must be one of {', '.join(RECURRENCES)}")
+
+    async def write(session: AsyncSession) -> bool:
+        add_reminder(session, message, due, recurrence)
+        return True
+
+    await _write(ctx, write)
+
+
+async def deliver_message(message: str, model_name: str | None = None) -> None:
+    """Send `message` to the configured Telegram chat and archive it.
+
+    The archived entry is a model response, so the chat agent sees the
+    message in its history.
+    """
     logger = logging.getLogger(__name__)
-    if not token:
+    if not os.environ.get("TELEGRAM_BOT_TOKEN"):
         logger.error("TELEGRAM_BOT_TOKEN not set; cannot send reminder")
         # Raise so agent runtimes can observe the failure and retry if desired
         raise RuntimeError("TELEGRAM_BOT_TOKEN not set in environment")
 
-    bot = Bot(token=token)
+    bot = await get_bot()
     # Use split_and_send to handle messages longer than Telegram's limit
     try:
         await split_and_send(
@@ -111,9 +307,45 @@ async def send_reminder(ctx: RunContext, message: str) -> None:
     response = ModelResponse(
         parts=[TextPart(content=message)],
         usage=RequestUsage(),
-        model_name=getattr(ctx, "model", None)
-        and getattr(ctx.model, "model_name", "unknown"),
+        model_name=model_name,
         timestamp=get_current_time(),
     )
     json_bytes = ModelMessagesTypeAdapter.dump_json([response])
-    await store_message_archive(json_bytes)
+    await store_message_archive(json_bytes, [response])
+
+
+async def send_reminder(
+    ctx: RunContext[ToolDeps], message: str, reminder_id: int | None = None
+) -> None:
+    """Send Reminder.
+
+    Send `message` to the configured Telegram chat and record it in the message archive.
+
+    Parameters
+    - message: str
+    - reminder_id: Optional[int]: ID of the due reminder being sent, if any
+
+    Returns
+    - None
+    """
+    if reminder_id is None:
+        # Reminders from memories must not repeat a scheduled reminder, which
+        # the scheduler sends (or has just sent) by itself.
+        scheduled = await find_scheduled_reminder(message, get_current_naive_time())
+        if scheduled is not None:
+            raise ModelRetry(
+                f"This is scheduled reminder {scheduled.id}, which is sent "
+                "automatically. Do not send it."
+            )
+    await deliver_message(
+        message,
+        model_name=getattr(ctx, "model", None)
+        and getattr(ctx.model, "model_name", "unknown"),
+    )
+    deps = getattr(ctx, "deps", None)
+    if (
+        reminder_id is not None
+        and isinstance(deps, ToolDeps)
+        and deps.delivered is not None
+    ):
+        deps.delivered.add(reminder_id)
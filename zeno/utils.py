@@ -1,12 +1,82 @@
-from datetime import datetime
+import calendar
+from datetime import datetime, timedelta
+from typing import Iterable
 from zoneinfo import ZoneInfo
 
+from pydantic_ai.messages import ModelMessage, ToolCallPart
+
+# Recurrence rules supported by reminders
+RECURRENCES = ("hourly", "daily", "weekly", "monthly", "yearly")
+
 
 def get_current_time() -> datetime:
     """Get current datetime in Europe/Berlin timezone."""
     return datetime.now(tz=ZoneInfo("Europe/Berlin"))
 
 
+def get_current_naive_time() -> datetime:
+    """Get current Europe/Berlin time without tzinfo, as stored in the DB."""
+    return get_current_time().replace(tzinfo=None)
+
+
+_STEPS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+
+def _add_months(dt: datetime, months: int) -> datetime:
+    month = dt.month - 1 + months
+    year = dt.year + month // 12
+    month = month % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+def next_occurrence(due: datetime, recurrence: str, after: datetime) -> datetime:
+    """Return the first occurrence of `recurrence` starting at `due` after `after`.
+
+    Monthly and yearly steps are counted from `due`, so a reminder on the
+    31st falls back to the last day of shorter months without drifting.
+    """
+    if recurrence not in RECURRENCES:
+        raise ValueError(f"unknown recurrence {recurrence!r}")
+    if recurrence in _STEPS:
+        step = _STEPS[recurrence]
+        if due > after:
+            return due
+        return due + step * ((after - due) // step + 1)
+
+    months = 1 if recurrence == "monthly" else 12
+    n = 0
+    candidate = due
+    while candidate <= after:
+        n += 1
+        candidate = _add_months(due, months * n)
+    return candidate
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the number of LLM tokens in `text` (~4 chars each)."""
+    return len(text) // 4 + 1
+
+
+def estimate_message_tokens(messages: Iterable[ModelMessage]) -> int:
+    """Estimate the LLM tokens of the text, tool calls and tool results in
+    `messages`."""
+    total = 0
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolCallPart):
+                text = f"{part.tool_name} {part.args_as_json_str()}"
+            else:
+                content = getattr(part, "content", "")
+                text = content if isinstance(content, str) else str(content)
+            total += estimate_tokens(text)
+    return total
+
+
 async def split_and_send(
     send, text: str, chat_id: int | None = None, max_length: int = 4096, **kwargs
 ):
@@ -49,6 +119,10 @@ async def split_and_send(
     while start < n:
         end = min(start + max_length, n)
         window = text[start:end]
+        if end == n:
+            # the rest fits into one message
+            chunks.append(window)
+            break
         split_at = window.rfind("\n")
         if split_at == -1:
             split_at = window.rfind(" ")